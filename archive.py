@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Precomputed event archive with constant time access by year.
+
+    archive.py build -o events.arc --first 1583 --last 4099
+    archive.py ics events.arc -c usa -y 2024 > holidays-2024.ics
+
+File layout (all little endian):
+
+    header      MAGIC, version, first year, last year and the file
+                positions of the sections below
+    years       uint64 record index where each year starts, plus one
+                final entry with the total record count
+    records     RECORD structs sorted by year
+    strings     uint32 offsets into the blob for each string, plus one
+                final entry with the blob length
+    blob        UTF-8 text of every string
+
+A record holds the start and end as seconds since the Unix epoch (UTC,
+midnight for all day events), string ids of the UID, summary and
+"calendar/category" name, and flags. Readers map the file and slice a
+year's records without parsing anything else.
+"""
+import sys
+import argparse
+import datetime
+import mmap
+import struct
+from concurrent.futures import ProcessPoolExecutor
+
+import calendars
+import icalutil
+
+# ---------------------------------------------------------------------------#
+
+MAGIC = b"ICSARC01"
+VERSION = 1
+
+# magic, version, first year, last year, years, records, strings, blob
+HEADER = struct.Struct("<8sIiiQQQQ")
+
+# start, end, uid id, summary id, category id, flags
+RECORD = struct.Struct("<qqIIHH")
+
+# record flags
+ALLDAY = 1
+
+# generate options and first valid year for each calendar
+SOURCES = {
+    "usa": ({"weeks": True, "days": True}, 1583),
+    "elca": ({}, 1993),
+    "astro": ({}, None),
+}
+
+EPOCH = datetime.datetime(1970, 1, 1)
+
+# ---------------------------------------------------------------------------#
+
+
+def toseconds(dte):
+    """Convert a date or naive UTC datetime to seconds since the epoch."""
+    if not isinstance(dte, datetime.datetime):
+        dte = datetime.datetime(dte.year, dte.month, dte.day)
+    delta = dte - EPOCH
+    return delta.days * 86400 + delta.seconds
+
+
+def fromseconds(seconds, allday):
+    """Convert seconds since the epoch back to a date or datetime."""
+    dte = EPOCH + datetime.timedelta(seconds=seconds)
+    return dte.date() if allday else dte
+
+
+def yearrecords(calendar, year):
+    """Compute the record fields of one calendar and year."""
+    options = SOURCES[calendar][0]
+    return [
+        (
+            toseconds(_.start),
+            toseconds(_.end),
+            _.uid,
+            # as written to SUMMARY, e.g. "None" for the elca Sundays
+            # left unnamed in some years (such as 2049)
+            str(_.summary),
+            "{}/{}".format(calendar, _.category),
+            0 if isinstance(_.start, datetime.datetime) else ALLDAY,
+        )
+        for _ in calendars.generate(calendar, year, options)
+    ]
+
+
+def yearevents(calendar, year, stats=False):
+    """Compute the events of one calendar and year in a worker process.
+
+    Returns (records, snapshot): with stats snapshot is the STATS report
+    of the worker for the parent to merge, otherwise None.
+    """
+    if stats:
+        return icalutil.collect(yearrecords, calendar, year)
+    return yearrecords(calendar, year), None
+
+
+def build(path, first, last, names, workers=None):
+    """Compute events for the years first to last and write an archive."""
+    strings = {}
+
+    def intern(text):
+        if text not in strings:
+            strings[text] = len(strings)
+        return strings[text]
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {}
+        for calendar in names:
+            minyear = SOURCES[calendar][1] or first
+            for year in range(max(first, minyear), last + 1):
+                futures[(year, calendar)] = pool.submit(
+                    yearevents, calendar, year, icalutil.STATS.enabled
+                )
+
+        offsets = []
+        records = bytearray()
+        count = 0
+        for year in range(first, last + 1):
+            offsets.append(count)
+            for calendar in names:
+                if (year, calendar) not in futures:
+                    continue
+                rows, snapshot = futures[(year, calendar)].result()
+                if snapshot is not None:
+                    icalutil.STATS.merge(snapshot)
+                for i in rows:
+                    records += RECORD.pack(
+                        i[0], i[1], intern(i[2]), intern(i[3]), intern(i[4]), i[5]
+                    )
+                    count += 1
+        offsets.append(count)
+
+    blob = bytearray()
+    stroffsets = []
+    for text in strings:
+        stroffsets.append(len(blob))
+        blob += text.encode("utf-8")
+    stroffsets.append(len(blob))
+
+    yearpos = HEADER.size
+    recpos = yearpos + 8 * len(offsets)
+    strpos = recpos + len(records)
+    blobpos = strpos + 4 * len(stroffsets)
+    with icalutil.atomic_open(path, "wb") as ofile:
+        ofile.write(
+            HEADER.pack(MAGIC, VERSION, first, last, yearpos, recpos, strpos, blobpos)
+        )
+        ofile.write(struct.pack("<{}Q".format(len(offsets)), *offsets))
+        ofile.write(records)
+        ofile.write(struct.pack("<{}I".format(len(stroffsets)), *stroffsets))
+        ofile.write(blob)
+    return count
+
+
+class Archive:
+    """Read only, memory mapped view of an event archive."""
+
+    def __init__(self, path):
+        with open(path, "rb") as ifile:
+            self.map = mmap.mmap(ifile.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self.map)
+        (magic, version, self.first, self.last, yearpos, recpos, strpos,
+         blobpos) = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("{} is not an event archive".format(path))
+        self.years = self.view[yearpos:recpos].cast("Q")
+        self.recpos = recpos
+        self.stroffsets = self.view[strpos:blobpos].cast("I")
+        self.blobpos = blobpos
+        self._strings = {}
+
+    def close(self):
+        """Release the mapping.
+
+        Views returned by records() or array() stay valid and keep the
+        file mapped until the last of them is released or garbage
+        collected; release() them (or use them in a with block) first to
+        unmap it here. An events() generator cannot be resumed after
+        close().
+        """
+        self.years.release()
+        self.stroffsets.release()
+        self.view.release()
+        try:
+            self.map.close()
+        except BufferError:
+            # exported views remain, the map is closed when they are freed
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def records(self, year):
+        """Get a zero copy memoryview of the packed records for a year."""
+        if not self.first <= year <= self.last:
+            raise ValueError("Year {} is not in the archive".format(year))
+        idx = year - self.first
+        start = self.recpos + self.years[idx] * RECORD.size
+        end = self.recpos + self.years[idx + 1] * RECORD.size
+        return self.view[start:end]
+
+    def array(self, year):
+        """Get a year's records as a NumPy structured array (zero copy).
+
+        Requires NumPy.
+        """
+        import numpy
+
+        dtype = numpy.dtype([
+            ("start", "<i8"),
+            ("end", "<i8"),
+            ("uid", "<u4"),
+            ("summary", "<u4"),
+            ("category", "<u2"),
+            ("flags", "<u2"),
+        ])
+        return numpy.frombuffer(self.records(year), dtype=dtype)
+
+    def string(self, idx):
+        """Get a string from the string table."""
+        if idx not in self._strings:
+            start = self.blobpos + self.stroffsets[idx]
+            end = self.blobpos + self.stroffsets[idx + 1]
+            self._strings[idx] = str(self.map[start:end], "utf-8")
+        return self._strings[idx]
+
+    def events(self, year, calendar=None):
+        """Decode a year's records into events, optionally for one calendar."""
+        for i in RECORD.iter_unpack(self.records(year)):
+            name = self.string(i[4])
+            cal, _, category = name.partition("/")
+            if calendar is not None and cal != calendar:
+                continue
+            allday = bool(i[5] & ALLDAY)
+            yield icalutil.Event(
+                self.string(i[2]),
+                fromseconds(i[0], allday),
+                fromseconds(i[1], allday),
+                self.string(i[3]),
+                category,
+            )
+
+
+def main():
+    """Parse our command line arguments and build or read an archive."""
+    parser = argparse.ArgumentParser(description="Precomputed event archive.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    pbuild = sub.add_parser("build", help="Precompute events into an archive")
+    pbuild.add_argument("-o", required=True, metavar="File")
+    pbuild.add_argument("--first", type=int, default=1583, metavar="Year")
+    pbuild.add_argument("--last", type=int, default=4099, metavar="Year")
+    pbuild.add_argument("-c", action="append", choices=sorted(SOURCES),
+                        metavar="Calendar",
+                        help="Calendar to include (repeatable, default: all)")
+    pbuild.add_argument("-j", type=int, metavar="Workers", default=None)
+    icalutil.add_stats_arguments(pbuild)
+
+    pics = sub.add_parser("ics", help="Write a year from an archive as icalendar")
+    pics.add_argument("archive")
+    pics.add_argument("-c", required=True, choices=sorted(SOURCES),
+                      metavar="Calendar")
+    pics.add_argument("-y", type=int, required=True, metavar="Year")
+    icalutil.add_stats_arguments(pics)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        if args.first > args.last:
+            sys.exit("First year must not be after the last year!")
+        # worker stats are merged into ours, the profile covers this process
+        with icalutil.instrument(args):
+            count = build(
+                args.o, args.first, args.last, args.c or list(SOURCES), args.j
+            )
+        print("Wrote {} events to {}".format(count, args.o), file=sys.stderr)
+        return
+
+    try:
+        with icalutil.instrument(args), Archive(args.archive) as archive:
+            calendars.render_ics(archive.events(args.y, args.c), sys.stdout, args.c)
+    except (OSError, ValueError) as err:
+        sys.exit(str(err))
+
+
+# ---------------------------------------------------------------------------#
+
+
+if __name__ == "__main__":
+    main()
@@ -4,9 +4,13 @@
 import sys
 import argparse
 import datetime
-from math import pi
+import functools
+from array import array
+from math import asin, atan2, cos, pi, radians, sin, tan
 import ephem
 from ephem import _find_moon_phase as find_moon_phase
+import i18n
+import icalutil
 
 # ---------------------------------------------------------------------------#
 
@@ -17,20 +21,109 @@ PRODID:-//Adyeths//python ical generator//EN
 CREATED;VALUE=DATE:{}
 """
 
-FOOTER = "END:VCALENDAR"
-
-VEVENT = """BEGIN:VEVENT
-UID:{}
-DTSTART:{}
-DTEND:{}
-SUMMARY:{}
-DTSTAMP:{}
-TRANSP:TRANSPARENT
-STATUS:CONFIRMED
-END:VEVENT"""
-
 TIMEDELTA = datetime.timedelta(seconds=1)
 
+EARTH_RADIUS_KM = 6378.137
+AU_KM = ephem.meters_per_au / 1000.0
+
+# Earth-Moon distances (km) at syzygy for supermoon/micromoon annotations.
+SUPERMOON_KM = 362000.0
+MICROMOON_KM = 405000.0
+
+# solar eclipse limits for the shadow axis distance from Earth's center,
+# in Earth radii (Meeus, Astronomical Algorithms, ch. 54).
+SOLAR_PARTIAL_LIMIT = 1.5433 + 0.0046
+SOLAR_CENTRAL_LIMIT = 0.9972
+
+# enlargement of Earth's shadow by the atmosphere (Danjon).
+SHADOW_ENLARGEMENT = 1.02
+
+# planets: ephem class name, label, inferior (orbits inside Earth's)
+PLANETS = (
+    ("Mercury", "☿ Mercury", True),
+    ("Venus", "♀ Venus", True),
+    ("Mars", "♂ Mars", False),
+    ("Jupiter", "♃ Jupiter", False),
+    ("Saturn", "♄ Saturn", False),
+    ("Uranus", "⛢ Uranus", False),
+    ("Neptune", "♆ Neptune", False),
+)
+
+# mean obliquity of the ecliptic at J2000, for astrometric longitudes
+OBLIQUITY = radians(23.4392911)
+
+# moon phase symbols by eighth of the lunation, as used for the phases
+LUNATION = ("🌚", "🌒", "🌓", "🌔", "🌝", "🌖", "🌗", "🌘")
+
+# daily moon summaries by waxing and by age under a day, one day or more
+MOONDAYS = {
+    True: (
+        "{phase} {percent}% illuminated, waxing, under a day old",
+        "{phase} {percent}% illuminated, waxing, {age} day old",
+        "{phase} {percent}% illuminated, waxing, {age} days old",
+    ),
+    False: (
+        "{phase} {percent}% illuminated, waning, under a day old",
+        "{phase} {percent}% illuminated, waning, {age} day old",
+        "{phase} {percent}% illuminated, waning, {age} days old",
+    ),
+}
+
+# equinoxes and solstices in order from January 1
+SEASONS = (
+    "♈ Vernal Equinox",
+    "♋ Summer Solstice",
+    "♎ Autumn Equinox",
+    "♑ Winter Solstice",
+)
+
+# the 24 solar terms: (longitude in degrees, pinyin, english name)
+SOLAR_TERMS = (
+    (0, "Chunfen", "Spring Equinox"),
+    (15, "Qingming", "Pure Brightness"),
+    (30, "Guyu", "Grain Rain"),
+    (45, "Lixia", "Start of Summer"),
+    (60, "Xiaoman", "Grain Buds"),
+    (75, "Mangzhong", "Grain in Ear"),
+    (90, "Xiazhi", "Summer Solstice"),
+    (105, "Xiaoshu", "Minor Heat"),
+    (120, "Dashu", "Major Heat"),
+    (135, "Liqiu", "Start of Autumn"),
+    (150, "Chushu", "End of Heat"),
+    (165, "Bailu", "White Dew"),
+    (180, "Qiufen", "Autumn Equinox"),
+    (195, "Hanlu", "Cold Dew"),
+    (210, "Shuangjiang", "Frost's Descent"),
+    (225, "Lidong", "Start of Winter"),
+    (240, "Xiaoxue", "Minor Snow"),
+    (255, "Daxue", "Major Snow"),
+    (270, "Dongzhi", "Winter Solstice"),
+    (285, "Xiaohan", "Minor Cold"),
+    (300, "Dahan", "Major Cold"),
+    (315, "Lichun", "Start of Spring"),
+    (330, "Yushui", "Rain Water"),
+    (345, "Jingzhe", "Awakening of Insects"),
+)
+
+# cross-quarter days: (longitude in degrees, name)
+CROSS_QUARTERS = (
+    (45, "Beltane"),
+    (135, "Lughnasadh"),
+    (225, "Samhain"),
+    (315, "Imbolc"),
+)
+
+# mean motion of the Sun in radians per day, to seed longitude searches
+SOLAR_RATE = 2.0 * pi / 365.2422
+
+# the first step of a search goes this far past the mean motion estimate,
+# since right ascension moves up to 12% slower near the equinoxes
+SOLAR_OVERSHOOT = 1.25
+
+# planetary event refinement: time tolerance and derivative step in days
+ROOT_TOLERANCE = 1.0 / 86400.0
+RATE_STEP = 1.0 / 24.0
+
 # ---------------------------------------------------------------------------#
 
 
@@ -76,81 +169,555 @@ def firstday(month, year, weekday):
     return firstdt.toordinal()
 
 
-def gendates(args: argparse.Namespace):
-    """Generate lists of events."""
-    # a variable to hold our dates.
-    dates = []
+def syzygynotes(dte, full, moon, sun):
+    """Get eclipse and supermoon annotations for a new or full moon.
+
+    Only checks the instant already found by the phase search: the Moon's
+    ecliptic latitude and distance decide whether an eclipse happens and
+    how close the Moon is. moon and sun are reused between calls.
+    """
+    moon.compute(dte)
+    sun.compute(dte)
+    icalutil.STATS.count("ephem.moon")
+    icalutil.STATS.count("ephem.sun")
+    mlat = ephem.Ecliptic(moon, epoch=dte).lat
+    slat = ephem.Ecliptic(sun, epoch=dte).lat
+    distance = moon.earth_distance * AU_KM
+    notes = []
+
+    if distance < SUPERMOON_KM:
+        notes.append("Supermoon")
+    elif distance > MICROMOON_KM:
+        notes.append("Micromoon")
+
+    if full:
+        # distance of the Moon from the center of Earth's shadow
+        sep = abs(mlat + slat)
+        parallax = asin(EARTH_RADIUS_KM / distance) + (
+            asin(EARTH_RADIUS_KM / (sun.earth_distance * AU_KM))
+        )
+        umbra = SHADOW_ENLARGEMENT * (parallax - sun.radius)
+        penumbra = SHADOW_ENLARGEMENT * (parallax + sun.radius)
+        if sep + moon.radius <= umbra:
+            notes.append("Total Lunar Eclipse")
+        elif sep - moon.radius < umbra:
+            notes.append("Partial Lunar Eclipse")
+        elif sep - moon.radius < penumbra:
+            notes.append("Penumbral Lunar Eclipse")
+    else:
+        # distance of the shadow axis from Earth's center in Earth radii
+        gamma = abs(sin(mlat - slat)) * distance / EARTH_RADIUS_KM
+        if gamma < SOLAR_CENTRAL_LIMIT:
+            if moon.radius > sun.radius:
+                notes.append("Total Solar Eclipse")
+            else:
+                notes.append("Annular Solar Eclipse")
+        elif gamma < SOLAR_PARTIAL_LIMIT:
+            notes.append("Partial Solar Eclipse")
 
-    ###########################################################################
+    return notes
+
+
+def eclon(body):
+    """Get the ecliptic longitude (J2000) of a computed body in radians."""
+    return atan2(
+        sin(body.a_ra) * cos(OBLIQUITY) + tan(body.a_dec) * sin(OBLIQUITY),
+        cos(body.a_ra),
+    )
+
+
+def wrap(angle):
+    """Wrap an angle in radians into -pi..pi."""
+    return (angle + pi) % (2.0 * pi) - pi
+
+
+def findroot(func, lo, hi, flo, fhi):
+    """Find a root of func between lo and hi where flo and fhi differ in sign.
+
+    Uses false position with the Illinois modification, which keeps the
+    bracket of bisection but usually needs far fewer evaluations.
+    """
+    side = 0
+    mid = lo
+    for _ in range(100):
+        last = mid
+        mid = hi - fhi * (hi - lo) / (fhi - flo)
+        if abs(mid - last) < ROOT_TOLERANCE or hi - lo < ROOT_TOLERANCE:
+            break
+        fmid = func(mid)
+        if fmid == 0.0:
+            break
+        if (fmid > 0.0) == (fhi > 0.0):
+            hi, fhi = mid, fmid
+            if side == -1:
+                flo /= 2.0
+            side = -1
+        else:
+            lo, flo = mid, fmid
+            if side == 1:
+                fhi /= 2.0
+            side = 1
+    return mid
+
+
+def sunlon(sun):
+    """Get the apparent ecliptic longitude of a computed Sun in radians.
+
+    The Sun stays on the ecliptic, so using the mean obliquity of J2000
+    only changes the result to second order.
+    """
+    return atan2(
+        sin(sun.ra) * cos(OBLIQUITY) + tan(sun.dec) * sin(OBLIQUITY),
+        cos(sun.ra),
+    )
 
-    # ### equinoxes and solstices
 
-    # start at beginning of year.
-    dte = ephem.Date("{}/1/1 0:0".format(args.y))
+def sunangle(sun, degrees):
+    """Get how far a computed Sun is past a longitude, in radians.
+
+    Multiples of 90 degrees are measured in right ascension like
+    ephem.next_equinox and next_solstice, so the seasons match them to the
+    second; other longitudes use the apparent ecliptic longitude.
+    """
+    if degrees % 90 == 0:
+        return wrap(sun.ra - radians(degrees))
+    return wrap(sunlon(sun) - radians(degrees))
+
+
+def solarcrossings(first, last, targets):
+    """Find when the Sun reaches target longitudes from first through last year.
+
+    targets are ecliptic longitudes in degrees. Each search is seeded from
+    the previous crossing and the mean solar motion, bracketed by one step
+    past the target and refined with findroot, all on one reused Sun, so
+    a crossing costs about three Sun positions. Returns (ephem.Date,
+    degrees) pairs in time order.
+    """
+    sun = ephem.Sun()
+    start = ephem.Date("{}/1/1 0:0".format(first))
+    end = ephem.Date("{}/1/1 0:0".format(last + 1))
+
+    def offset(dte, degrees):
+        sun.compute(dte)
+        icalutil.STATS.count("ephem.sun")
+        return sunangle(sun, degrees)
+
+    sun.compute(start)
+    prev, prevlon = start, sunlon(sun) * 180.0 / pi % 360.0
+    targets = sorted({_ % 360 for _ in targets})
+    targets = [_ for _ in targets if _ > prevlon] + [
+        _ for _ in targets if _ <= prevlon
+    ]
+    found = []
+    for idx in range(len(targets) * (last - first + 2)):
+        degrees = targets[idx % len(targets)]
+        seed = prev + radians((degrees - prevlon) % 360 or 360) / SOLAR_RATE
+        fseed = offset(seed, degrees)
+        step = seed - SOLAR_OVERSHOOT * fseed / SOLAR_RATE
+        fstep = offset(step, degrees)
+        while (fstep > 0.0) == (fseed > 0.0) and abs(step - seed) > ROOT_TOLERANCE:
+            seed, fseed = step, fstep
+            step = seed - SOLAR_OVERSHOOT * fseed / SOLAR_RATE
+            fstep = offset(step, degrees)
+        if seed > step:
+            seed, step, fseed, fstep = step, seed, fstep, fseed
+        dte = ephem.Date(findroot(
+            lambda x: offset(x, degrees), seed, step, fseed, fstep
+        ))
+        if dte >= end:
+            break
+        if dte >= start:
+            found.append((dte, degrees))
+        prev, prevlon = dte, degrees
+    return found
+
+
+@functools.lru_cache(maxsize=8)
+def solarterms(year):
+    """Get the 24 solar terms of a year as (ephem.Date, degrees), cached."""
+    with icalutil.STATS.timer("ephem"):
+        return tuple(solarcrossings(year, year, [_[0] for _ in SOLAR_TERMS]))
+
+
+def scanplanets(start, days, bodies, sun):
+    """Compute daily positions of the Sun and planets in one batched pass.
+
+    Returns (sun longitudes, {name: longitudes}, {name: elongations}) as
+    arrays indexed by day from start. bodies and sun are reused.
+    """
+    sunlon = array("d")
+    lon = {_: array("d") for _ in bodies}
+    elong = {_: array("d") for _ in bodies}
+    for i in range(days):
+        dte = start + i
+        sun.compute(dte)
+        sunlon.append(eclon(sun))
+        for name, body in bodies.items():
+            body.compute(dte)
+            lon[name].append(eclon(body))
+            elong[name].append(body.elong)
+    return sunlon, lon, elong
+
+
+def brackets(values):
+    """Get the indexes i where values[i] and values[i + 1] differ in sign."""
+    return [
+        i for i, (one, two) in enumerate(zip(values, values[1:]))
+        if (one > 0.0) != (two > 0.0)
+    ]
+
+
+def planetevents(year):
+    """Find conjunctions, oppositions, greatest elongations and stations.
+
+    A daily scan brackets each sign change of the planet-Sun longitude
+    difference, the elongation rate and the longitude rate, and each is
+    then refined to the second. Returns a list of (ephem.Date, text).
+    """
+    first = ephem.Date("{}/1/1 0:0".format(year))
+    last = ephem.Date("{}/1/1 0:0".format(year + 1))
+    # one spare day on each side so rates are known at the year's edges
+    start = ephem.Date(first - 2)
+    days = int(last - first) + 5
+    sun = ephem.Sun()
+    bodies = {_[0]: getattr(ephem, _[0])() for _ in PLANETS}
+    with icalutil.STATS.timer("ephem"):
+        sunlon, lon, elong = scanplanets(start, days, bodies, sun)
+    icalutil.STATS.count("ephem.planets", days * (len(bodies) + 1))
+
+    events = []
+    for name, label, inferior in PLANETS:
+        body = bodies[name]
+
+        def separation(dte):
+            sun.compute(dte)
+            body.compute(dte)
+            icalutil.STATS.count("ephem.planets", 2)
+            return sin(eclon(body) - eclon(sun))
+
+        def elongrate(dte):
+            body.compute(dte - RATE_STEP)
+            before = body.elong
+            body.compute(dte + RATE_STEP)
+            icalutil.STATS.count("ephem.planets", 2)
+            return body.elong - before
+
+        def lonrate(dte):
+            body.compute(dte - RATE_STEP)
+            before = eclon(body)
+            body.compute(dte + RATE_STEP)
+            icalutil.STATS.count("ephem.planets", 2)
+            return wrap(eclon(body) - before)
+
+        found = []
+        diff = [sin(p - s) for p, s in zip(lon[name], sunlon)]
+        for i in brackets(diff):
+            dte = findroot(separation, start + i, start + i + 1, diff[i], diff[i + 1])
+            sun.compute(dte)
+            body.compute(dte)
+            icalutil.STATS.count("ephem.planets", 2)
+            if cos(eclon(body) - eclon(sun)) < 0.0:
+                key = "{planet} at Opposition"
+            elif not inferior:
+                key = "{planet} in Conjunction with the Sun"
+            elif body.earth_distance < sun.earth_distance:
+                key = "{planet} at Inferior Conjunction"
+            else:
+                key = "{planet} at Superior Conjunction"
+            found.append((dte, key))
+
+        # rates are centred half way between days
+        rates = [("elong", elongrate, [
+            two - one for one, two in zip(elong[name], elong[name][1:])
+        ])] if inferior else []
+        rates.append(("lon", lonrate, [
+            wrap(two - one) for one, two in zip(lon[name], lon[name][1:])
+        ]))
+        for kind, func, rate in rates:
+            for i in brackets(rate):
+                lo, hi = start + i + 0.5, start + i + 1.5
+                flo, fhi = func(lo), func(hi)
+                if (flo > 0.0) == (fhi > 0.0):
+                    lo, hi = lo - 1.0, hi + 1.0
+                    flo, fhi = func(lo), func(hi)
+                    if (flo > 0.0) == (fhi > 0.0):
+                        continue
+                dte = findroot(func, lo, hi, flo, fhi)
+                if kind == "elong":
+                    key = {
+                        True: "{planet} at Greatest Elongation East",
+                        False: "{planet} at Greatest Elongation West",
+                    }[rate[i] > 0.0]
+                else:
+                    key = {
+                        True: "{planet} Stationary, Retrograde",
+                        False: "{planet} Stationary, Direct",
+                    }[rate[i] > 0.0]
+                found.append((dte, key))
+
+        for dte, key in found:
+            if first <= dte < last:
+                icalutil.STATS.count("planets")
+                events.append((ephem.Date(dte), i18n.text(key, planet=label)))
+    return events
+
+
+def moondays(year, phases, moon):
+    """Get all day events with the Moon's illumination and age for a year.
+
+    phases holds (ephem.Date, eighth) for the phase instants gendates
+    found, eighth being 0 for new moons up to 7 for waning crescents, plus
+    the new moon before January 1. Between two consecutive instants the
+    Moon gains 45 degrees on the Sun almost linearly, so each day (at noon
+    UTC) is interpolated instead of computing the Moon again; only days
+    before the year's first instants are computed, reusing moon. This adds
+    about 8% to the time of gendates.
+    """
+    points = sorted(phases)
+    first = datetime.date(year, 1, 1)
+    start = ephem.Date("{}/1/1 12:00".format(year))
+    days = []
+    idx = 0
+    newmoon = points[0][0]
+    for i in range((datetime.date(year + 1, 1, 1) - first).days):
+        dte = start + i
+        while points[idx + 1][0] <= dte:
+            idx += 1
+            if points[idx][1] == 0:
+                newmoon = points[idx][0]
+        (dt0, eighth0), (dt1, eighth1) = points[idx], points[idx + 1]
+        if (eighth1 - eighth0) % 8 == 1:
+            angle = (eighth0 + (dte - dt0) / (dt1 - dt0)) * pi / 4.0
+        else:
+            with icalutil.STATS.timer("ephem"):
+                moon.compute(dte)
+            icalutil.STATS.count("ephem.moon")
+            angle = moon.elong % (2.0 * pi)
+        day = first + datetime.timedelta(days=i)
+        age = int(dte - newmoon)
+        days.append((
+            day,
+            day + datetime.timedelta(days=1),
+            i18n.text(
+                MOONDAYS[angle % (2.0 * pi) < pi][min(age, 2)],
+                phase=LUNATION[int(angle * 4.0 / pi + 0.5) % 8],
+                percent=int((1.0 - cos(angle)) * 50.0 + 0.5),
+                age=age,
+            ),
+            "daily",
+        ))
+    return days
+
+
+def outputcategories(planets=False, daily=False, terms=False,
+                     crossquarter=False):
+    """Get the set of event categories enabled by the generate options."""
+    return {"seasons", "moon"} | {
+        _ for _, enabled in (
+            ("planets", planets),
+            ("daily", daily),
+            ("terms", terms),
+            ("crossquarter", crossquarter),
+        ) if enabled
+    }
+
+
+@functools.lru_cache(maxsize=8)
+def syzygies(year):
+    """Find the equinoxes, solstices and moon phases of a year.
+
+    Returns (seasons, phases): the four equinox and solstice instants, and
+    (ephem.Date, eighth) for every moon phase of the year followed by the
+    first of the same eighth in the next year, eighth being 0 for new moons
+    up to 7 for waning crescents. The result is cached so the astro feed
+    and the calendars derived from it (see lunisolar.py) share one pass.
+    """
+    phases = []
 
     # get date and time of equinox and solstice events
-    for i in range(0, 4):
-        fnc, mystr = {
-            0: (ephem.next_equinox, "♈ Vernal Equinox"),
-            1: (ephem.next_solstice, "♋ Summer Solstice"),
-            2: (ephem.next_equinox, "♎ Autumn Equinox"),
-            3: (ephem.next_solstice, "♑ Winter Solstice"),
-        }[i]
-        dte = fnc(dte)
-        dtn = [int(_) for _ in dte.tuple()]
-        # dt1 = datetime.datetime(dtn[0], dtn[1], dtn[2], dtn[3], dtn[4], dtn[5])
-        dt1 = datetime.datetime(dtn[0], dtn[1], dtn[2], dtn[3], dtn[4], 0)
-        dt2 = dt1 + TIMEDELTA
-        # dt2 = dt1
-        dates.append(
-            (
-                dt1.strftime("%Y%m%dT%H%M%SZ"),
-                dt2.strftime("%Y%m%dT%H%M%SZ"),
-                "{}".format(mystr),
-            )
-        )
+    with icalutil.STATS.timer("ephem"):
+        seasons = [_[0] for _ in solarcrossings(year, year, (0, 90, 180, 270))]
 
     # ### moon phases
     for i in range(0, 8):
-        fnc, mystr = {
-            0: (ephem.next_new_moon, "🌚"),
-            1: (next_waxcres, "🌒"),
-            2: (ephem.next_first_quarter_moon, "🌓"),
-            3: (next_waxgib, "🌔"),
-            4: (ephem.next_full_moon, "🌝"),
-            5: (next_wangib, "🌖"),
-            6: (ephem.next_last_quarter_moon, "🌗"),
-            7: (next_wancres, "🌘"),
+        fnc = {
+            0: ephem.next_new_moon,
+            1: next_waxcres,
+            2: ephem.next_first_quarter_moon,
+            3: next_waxgib,
+            4: ephem.next_full_moon,
+            5: next_wangib,
+            6: ephem.next_last_quarter_moon,
+            7: next_wancres,
         }[i]
 
         # start at beginning of year
-        dte = ephem.Date("{}/1/1 0:0".format(args.y))
+        dte = ephem.Date("{}/1/1 0:0".format(year))
 
         # get date and time of moon phases
         while True:
-            dte = fnc(dte)
+            with icalutil.STATS.timer("ephem"):
+                dte = fnc(dte)
+            icalutil.STATS.count("ephem." + fnc.__name__)
+            phases.append((dte, i))
+            if dte.triple()[0] > year:
+                break
+
+    return tuple(seasons), tuple(phases)
+
+
+def gendates(year, annotate=False, planets=False, daily=False, terms=False,
+             crossquarter=False):
+    """Generate lists of (start, end, summary, category) events.
+
+    With annotate, new and full moons are marked with eclipses and
+    supermoons/micromoons. planets adds planetary conjunctions,
+    oppositions, greatest elongations and stations. terms adds the 24
+    solar terms and crossquarter the cross-quarter days. daily adds an all
+    day event per day with the Moon's illumination and age, after the
+    timed events.
+    """
+    # a variable to hold our dates.
+    dates = []
+    moon = ephem.Moon()
+    sun = ephem.Sun()
+    seasons, phases = syzygies(year)
+    phases = list(phases)
+
+    ###########################################################################
+
+    # ### equinoxes and solstices
+    for dte, mystr in zip(seasons, SEASONS):
+        dtn = [int(_) for _ in dte.tuple()]
+        # dt1 = datetime.datetime(dtn[0], dtn[1], dtn[2], dtn[3], dtn[4], dtn[5])
+        dt1 = datetime.datetime(dtn[0], dtn[1], dtn[2], dtn[3], dtn[4], 0)
+        dt2 = dt1 + TIMEDELTA
+        # dt2 = dt1
+        dates.append((dt1, dt2, "{}".format(mystr), "seasons"))
+
+    # ### moon phases
+    for dte, i in phases:
+        if dte.triple()[0] > year:
+            continue
+        mystr = LUNATION[i]
+        dtn = [int(_) for _ in dte.tuple()]
+        # dt1 = datetime.datetime(
+        #     dtn[0], dtn[1], dtn[2], dtn[3], dtn[4], dtn[5]
+        # )
+        dt1 = datetime.datetime(
+            dtn[0], dtn[1], dtn[2], dtn[3], dtn[4], 0
+        )
+        dt2 = dt1 + TIMEDELTA
+        # dt2 = dt1
+        text = "{}".format(mystr)
+        if annotate and i in (0, 4):
+            with icalutil.STATS.timer("annotate"):
+                notes = syzygynotes(dte, i == 4, moon, sun)
+            if notes:
+                text = i18n.variant(
+                    "{phase} {notes}", mystr, phase=mystr, notes=tuple(notes)
+                )
+        dates.append((dt1, dt2, text, "moon"))
+
+    # ### planetary events
+    if planets:
+        with icalutil.STATS.timer("planets"):
+            found = planetevents(year)
+        for dte, text in found:
             dtn = [int(_) for _ in dte.tuple()]
-            # dt1 = datetime.datetime(
-            #     dtn[0], dtn[1], dtn[2], dtn[3], dtn[4], dtn[5]
-            # )
-            dt1 = datetime.datetime(
-                dtn[0], dtn[1], dtn[2], dtn[3], dtn[4], 0
-            )
-            dt2 = dt1 + TIMEDELTA
-            # dt2 = dt1
-            if dte.triple()[0] <= args.y:
-                dates.append(
-                    (
-                        dt1.strftime("%Y%m%dT%H%M%SZ"),
-                        dt2.strftime("%Y%m%dT%H%M%SZ"),
-                        "{}".format(mystr),
-                    )
+            dt1 = datetime.datetime(dtn[0], dtn[1], dtn[2], dtn[3], dtn[4], 0)
+            dates.append((dt1, dt1 + TIMEDELTA, text, "planets"))
+
+    # ### solar terms and cross-quarter days
+    if terms or crossquarter:
+        names = {_[0]: _[1:] for _ in SOLAR_TERMS}
+        quarters = dict(CROSS_QUARTERS)
+        for dte, degrees in solarterms(year):
+            dtn = [int(_) for _ in dte.tuple()]
+            dt1 = datetime.datetime(dtn[0], dtn[1], dtn[2], dtn[3], dtn[4], 0)
+            if terms:
+                text = i18n.text(
+                    "☀ {pinyin}, {name}",
+                    pinyin=names[degrees][0],
+                    name=names[degrees][1],
                 )
-            else:
-                break
+                dates.append((dt1, dt1 + TIMEDELTA, text, "terms"))
+            if crossquarter and degrees in quarters:
+                text = i18n.text(
+                    "✦ {name}, cross-quarter day", name=quarters[degrees]
+                )
+                dates.append((dt1, dt1 + TIMEDELTA, text, "crossquarter"))
+
+    # ### daily moon illumination and age
+    days = []
+    if daily:
+        with icalutil.STATS.timer("ephem"):
+            phases.append((ephem.previous_new_moon("{}/1/1 0:0".format(year)), 0))
+        icalutil.STATS.count("ephem.previous_new_moon")
+        with icalutil.STATS.timer("daily"):
+            days = moondays(year, phases, moon)
 
     # ### return our dates
-    return sorted(dates)
+    return sorted(dates) + days
+
+
+def generate(years, tz=None, annotate=False, planets=False, daily=False,
+             terms=False, crossquarter=False):
+    """Yield calendar events for one or more years.
+
+    Event times are in UTC unless tz names a time zone (e.g. America/Chicago).
+    annotate adds eclipses and supermoons to new and full moons, planets
+    adds planetary events, terms and crossquarter add the solar terms and
+    cross-quarter days, and daily adds the Moon's illumination and age as
+    all day events.
+    """
+    years = icalutil.yearlist(years)
+    for year in years:
+        seen = {}
+        with icalutil.STATS.timer("rules"):
+            dates = gendates(
+                year, annotate, planets, daily, terms, crossquarter
+            )
+        icalutil.STATS.count("dates", 2 * len(dates))
+        for i in dates:
+            dt1, dt2 = i[0], i[1]
+            if tz is not None and isinstance(dt1, datetime.datetime):
+                dt1 = icalutil.tolocal(dt1, tz, min(years), max(years))
+                dt2 = icalutil.tolocal(dt2, tz, min(years), max(years))
+            yield icalutil.Event(
+                icalutil.stableuid("astro", year, i18n.ident(i[2]), seen),
+                dt1,
+                dt2,
+                i[2],
+                i[3],
+            )
+
+
+def sources():
+    """Get the files holding the rules for this calendar."""
+    return [__file__, i18n.__file__, icalutil.__file__]
+
+
+def header(options=None, years=()):
+    """Get the calendar header for generate() options and years.
+
+    A tz option adds the VTIMEZONE of that zone covering years.
+    """
+    tz = (options or {}).get("tz")
+    if tz is None:
+        return HEADER
+    years = icalutil.yearlist(years)
+    if not years:
+        raise ValueError("The years are required to write a time zone!")
+    return HEADER + icalutil.vtimezone(tz, min(years), max(years))
+
+
+def render_ics(events, stream, created=None, tz=None, years=()):
+    """Write events to stream as an astronomical icalendar file.
+
+    tz and years must match the generate() call when a time zone is used.
+    """
+    icalutil.render_ics(events, stream, header({"tz": tz}, years), created)
 
 
 def main():
@@ -159,39 +726,64 @@ def main():
         description="Create an astronomical event calendar."
     )
     parser.add_argument("-y", type=int, required=True, metavar="Year")
+    parser.add_argument("--tz",
+                        metavar="Area/City",
+                        help="Write event times in this time zone instead of UTC")
+    parser.add_argument("-e",
+                        help="Mark eclipses and supermoons on new and full moons",
+                        action="store_true")
+    parser.add_argument("-p",
+                        help="Include planetary conjunctions, oppositions, "
+                             "elongations and stations",
+                        action="store_true")
+    parser.add_argument("--daily",
+                        help="Include the Moon's illumination and age every day",
+                        action="store_true")
+    parser.add_argument("-t",
+                        help="Include the 24 solar terms",
+                        action="store_true")
+    parser.add_argument("-x",
+                        help="Include the cross-quarter days",
+                        action="store_true")
+    i18n.add_locale_argument(parser)
+    icalutil.add_output_arguments(parser)
     args = parser.parse_args()
 
+    if args.tz is not None:
+        try:
+            icalutil.zone(args.tz)
+        except (ValueError, KeyError):
+            sys.exit("Unknown time zone: {}".format(args.tz))
+
     print("Generating calendar for {}".format(args.y), file=sys.stderr)
 
     ###########################################################################
 
-    # ###################################### #
-    dates = gendates(args)
-
-    # ### Output ical file for dates and fdates.
-    with open("astro-{}.ics".format(args.y), "w") as ofile:
-        created = datetime.datetime.now().strftime("%Y%m%dT%H%M%SZ")
-
-        # ical header
-        ofile.write(HEADER.format(created).replace("\n", "\r\n"))
-
-        # output our calendar dates
-        uid = 0
-        for i in sorted(dates, key=lambda x: x[0]):
-            uid += 1
-            dtstart = i[0]
-            dtend = i[1]
-            event = VEVENT.format(
-                "astro{}{:03d}@adyeths".format(args.y, uid),
-                dtstart,
-                dtend,
-                i[2],
-                created,
-            )
-            print(event.replace("\n", "\r\n"), file=ofile, end="\r\n")
-
-        # ical footer
-        ofile.write(FOOTER.replace("\n", "\r\n"))
+    # ### Output ical file for dates.
+    try:
+        i18n.output(
+            "astro-{}.ics".format(args.y),
+            header({"tz": args.tz}, args.y),
+            lambda: generate(
+                args.y, args.tz, args.e, args.p, args.daily, args.t, args.x
+            ),
+            args,
+            {
+                "calendar": "astro",
+                "years": [args.y],
+                "tz": args.tz,
+                "eclipses": args.e,
+                "planets": args.p,
+                "daily": args.daily,
+                "terms": args.t,
+                "crossquarter": args.x,
+                "ephem": ephem.__version__,
+            },
+            sources(),
+            outputcategories(args.p, args.daily, args.t, args.x),
+        )
+    except ValueError as err:
+        sys.exit(str(err))
 
 
 # ---------------------------------------------------------------------------#
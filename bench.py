@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Benchmark the calendar generators.
+
+    bench.py run -o baseline.json
+    bench.py run -o current.json
+    bench.py compare baseline.json current.json
+
+Generation functions (usa.genholidays, elca.getdates/getfdates/getfdates2,
+astro.gendates) are timed separately from serialization (render_ics) and
+from end to end file output. Each benchmark runs in its own process so the
+peak RSS reported belongs to that benchmark alone.
+"""
+import sys
+import argparse
+import io
+import json
+import os
+import platform
+import resource
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import calendars
+import icalutil
+
+# ---------------------------------------------------------------------------#
+
+# first year of each range per calendar
+FIRSTYEAR = {"usa": 1993, "elca": 1993, "astro": 1900}
+
+# ---------------------------------------------------------------------------#
+
+
+def ephemcalls():
+    """Get the ephem searches and body computations counted in STATS.
+
+    astro counts each of them under an "ephem." counter (ephem.sun,
+    ephem.moon, ephem.planets and the phase searches by name).
+    """
+    return sum(
+        value for name, value in icalutil.STATS.counters.items()
+        if name.startswith("ephem.")
+    )
+
+
+def gen_usa(years):
+    """usa.genholidays for each year."""
+    module = calendars.getmodule("usa")
+    return sum(len(_) for year in years for _ in module.genholidays(year))
+
+
+def gen_elca_sundays(years):
+    """elca.getdates for each year."""
+    module = calendars.getmodule("elca")
+    return sum(len(module.getdates(year)) for year in years)
+
+
+def gen_elca_lesser(years):
+    """elca.getfdates for each year."""
+    module = calendars.getmodule("elca")
+    return sum(len(module.getfdates(year)) for year in years)
+
+
+def gen_elca_commemorations(years):
+    """elca.getfdates2 for each year."""
+    module = calendars.getmodule("elca")
+    return sum(len(module.getfdates2(year)) for year in years)
+
+
+def gen_astro(years):
+    """astro.gendates for each year."""
+    module = calendars.getmodule("astro")
+    return sum(len(module.gendates(year)) for year in years)
+
+
+# name -> (calendar, kind, function or generate options)
+BENCHMARKS = {
+    "usa.genholidays": ("usa", "gen", gen_usa),
+    "elca.getdates": ("elca", "gen", gen_elca_sundays),
+    "elca.getfdates": ("elca", "gen", gen_elca_lesser),
+    "elca.getfdates2": ("elca", "gen", gen_elca_commemorations),
+    "astro.gendates": ("astro", "gen", gen_astro),
+    "usa.render": ("usa", "render", {"weeks": True, "days": True}),
+    "elca.render": ("elca", "render", {}),
+    "astro.render": ("astro", "render", {}),
+    "usa.end2end": ("usa", "end2end", {"weeks": True, "days": True}),
+    "elca.end2end": ("elca", "end2end", {}),
+    "astro.end2end": ("astro", "end2end", {}),
+}
+
+# ---------------------------------------------------------------------------#
+
+
+def runone(name, span, repeat, stats=False):
+    """Run one benchmark in this process and return its measurements.
+
+    With stats the STATS report of the last repetition is returned under
+    "stats" for the parent to merge.
+    """
+    calendar, kind, target = BENCHMARKS[name]
+    module = calendars.getmodule(calendar)
+    counted = calendar == "astro" or stats
+    if counted:
+        icalutil.STATS.enable()
+    years = range(FIRSTYEAR[calendar], FIRSTYEAR[calendar] + span)
+
+    if kind == "render":
+        # serialization only: generate once up front
+        events = list(calendars.generate(calendar, years, target))
+
+    best = None
+    nbytes = 0
+    for _ in range(repeat):
+        if counted:
+            icalutil.STATS.reset()
+        if hasattr(module, "syzygies"):
+            # measure the ephem searches, not the per year cache
+            module.syzygies.cache_clear()
+        start = time.perf_counter()
+        if kind == "gen":
+            nevents = target(years)
+        elif kind == "render":
+            buf = io.StringIO()
+            calendars.render_ics(events, buf, calendar)
+            nevents = len(events)
+            nbytes = len(buf.getvalue().encode("utf-8"))
+        else:
+            with tempfile.TemporaryDirectory() as tmpdir:
+                path = os.path.join(tmpdir, "bench.ics")
+                with open(path, "w") as ofile:
+                    events = list(calendars.generate(calendar, years, target))
+                    calendars.render_ics(events, ofile, calendar)
+                nevents = len(events)
+                nbytes = os.path.getsize(path)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    result = {
+        "seconds": best,
+        "events": nevents,
+        "events_per_sec": nevents / best if best else None,
+        "bytes": nbytes,
+        "bytes_per_sec": nbytes / best if best and nbytes else None,
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+    if calendar == "astro":
+        result["ephem_calls"] = ephemcalls()
+    if stats:
+        result["stats"] = icalutil.STATS.report()
+    return result
+
+
+def run(names, spans, repeat, report=sys.stderr):
+    """Run benchmarks, each in a fresh process, and return the results."""
+    results = {}
+    for name in names:
+        calendar = BENCHMARKS[name][0]
+        try:
+            calendars.getmodule(calendar)
+        except ImportError as err:
+            print("skipping {}: {}".format(name, err), file=report)
+            continue
+        for span in spans:
+            key = "{}/{}".format(name, span)
+            with ProcessPoolExecutor(max_workers=1) as pool:
+                results[key] = pool.submit(
+                    runone, name, span, repeat, icalutil.STATS.enabled
+                ).result()
+            snapshot = results[key].pop("stats", None)
+            if snapshot is not None:
+                icalutil.STATS.merge(snapshot)
+            if report is not None:
+                res = results[key]
+                print(
+                    "{:28} {:10.4f}s {:12.0f} events/s {:>14} bytes/s {:8d} KiB".format(
+                        key,
+                        res["seconds"],
+                        res["events_per_sec"] or 0,
+                        "-" if res["bytes_per_sec"] is None
+                        else "{:.0f}".format(res["bytes_per_sec"]),
+                        res["peak_rss_kb"],
+                    ),
+                    file=report,
+                )
+    return results
+
+
+def metadata():
+    """Describe the environment the benchmarks ran in."""
+    meta = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    }
+    try:
+        import ephem
+
+        meta["ephem"] = ephem.__version__
+    except ImportError:
+        pass
+    return meta
+
+
+def compare(baseline, current, threshold, report=sys.stdout):
+    """Compare two result files and return the list of regressions."""
+    regressions = []
+    for key in sorted(set(baseline["results"]) & set(current["results"])):
+        old = baseline["results"][key]["seconds"]
+        new = current["results"][key]["seconds"]
+        ratio = new / old if old else 1.0
+        flag = ""
+        if ratio > 1.0 + threshold:
+            flag = "REGRESSION"
+            regressions.append(key)
+        print(
+            "{:28} {:10.4f}s {:10.4f}s {:7.2f}x {}".format(key, old, new, ratio, flag),
+            file=report,
+        )
+    return regressions
+
+
+def main():
+    """Parse our command line arguments and run or compare benchmarks."""
+    parser = argparse.ArgumentParser(description="Benchmark the calendar generators.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    prun = sub.add_parser("run", help="Run benchmarks and save the results")
+    prun.add_argument("-o", metavar="File", help="Write JSON results to File")
+    prun.add_argument(
+        "-b",
+        metavar="Name",
+        action="append",
+        choices=sorted(BENCHMARKS),
+        help="Benchmark to run (repeatable, default: all)",
+    )
+    prun.add_argument(
+        "--years",
+        default="1,100,1000",
+        metavar="N,N",
+        help="Comma separated year range lengths (default: 1,100,1000)",
+    )
+    prun.add_argument("--repeat", type=int, default=3, metavar="N",
+                      help="Repetitions, the best time is kept (default: 3)")
+    icalutil.add_stats_arguments(prun)
+
+    pcmp = sub.add_parser("compare", help="Fail if current is slower than baseline")
+    pcmp.add_argument("baseline")
+    pcmp.add_argument("current")
+    pcmp.add_argument("--threshold", type=float, default=0.10, metavar="Fraction",
+                      help="Allowed slowdown before failing (default: 0.10)")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        spans = [int(_) for _ in args.years.split(",")]
+        # the stats of the last repetition of each benchmark are merged,
+        # the profile covers this process
+        with icalutil.instrument(args):
+            results = run(args.b or list(BENCHMARKS), spans, args.repeat)
+        data = {"meta": metadata(), "results": results}
+        if args.o:
+            with open(args.o, "w") as ofile:
+                json.dump(data, ofile, indent=1, sort_keys=True)
+        return
+
+    with open(args.baseline) as ifile:
+        baseline = json.load(ifile)
+    with open(args.current) as ifile:
+        current = json.load(ifile)
+    regressions = compare(baseline, current, args.threshold)
+    if regressions:
+        sys.exit("{} benchmark(s) regressed beyond {:.0%}".format(
+            len(regressions), args.threshold))
+
+
+# ---------------------------------------------------------------------------#
+
+
+if __name__ == "__main__":
+    main()
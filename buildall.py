@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Build many calendars for many years in a single process pool.
+
+The manifest is a JSON file containing a list of jobs:
+
+    {"jobs": [
+        {"calendar": "usa", "years": [1993, 2100],
+         "options": {"weeks": true, "days": true},
+         "output": "out/holidays-wd-{year}.ics"},
+        {"calendar": "usa", "years": [1993, 2100],
+         "options": {"region": "TX"},
+         "output": "out/holidays-tx-{year}.ics"},
+        {"calendar": "astro", "years": [1993, 2100],
+         "output": "out/astro-{year}.ics"}
+    ]}
+
+"years" is an inclusive [first, last] range or a single year. An output
+path containing {year} gets one file per year, otherwise all years are
+written to one file. An optional "compress" of "gzip" or "zstd"
+compresses the outputs and adds .gz/.zst to their names. An optional
+"locales" list such as ["en", "es", "de"] writes each output once per
+language (e.g. elca-2024.es.ics) from the same computed events.
+
+With --batch, jobs are instead read from stdin (or a Unix socket with
+--socket) as one JSON object per line, using the same keys as a manifest
+job plus an optional "dtstamp". Each job is run in this process as soon as
+it arrives and a JSON result line with its latency is written back.
+
+Optional top level keys: "dtstamp" gives a fixed CREATED/DTSTAMP (see
+icalutil.resolve_stamp) and "state" names a file recording input and
+output hashes so unchanged outputs are skipped on the next build.
+
+--stats and --profile work as in the calendar scripts. The stats of pool
+workers are sent back and merged, and with --batch one report covers
+every job of the session.
+"""
+import sys
+import argparse
+import inspect
+import io
+import json
+import os
+import socketserver
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import calendars
+import datetables
+import i18n
+import icalutil
+
+# ---------------------------------------------------------------------------#
+
+# calendars that are expensive to compute are scheduled first so they are
+# not left running alone at the end of the build.
+PRIORITY = {"astro": 0, "lunisolar": 0, "elca": 1, "usa": 2}
+
+# ---------------------------------------------------------------------------#
+
+
+def loadmanifest(fname):
+    """Read a manifest file and return (jobs, settings)."""
+    with open(fname) as ifile:
+        manifest = json.load(ifile)
+    if isinstance(manifest, list):
+        manifest = {"jobs": manifest}
+    jobs = [normalize(_) for _ in manifest["jobs"]]
+    return jobs, {_: manifest.get(_) for _ in ("dtstamp", "state")}
+
+
+def normalize(job):
+    """Check a job and expand its years into a list."""
+    calendars.getmodule(job["calendar"])
+    years = job["years"]
+    if isinstance(years, int):
+        years = [years, years]
+    job["years"] = list(range(years[0], years[-1] + 1))
+    job.setdefault("options", {})
+    return job
+
+
+def taskoptions(calendar, options):
+    """Get the options to compute a calendar with and the categories to keep.
+
+    Calendars whose options only select categories are computed once with
+    every category enabled, then filtered for each output. Selectors such
+    as the usa region are only widened to True (all) when a job uses one,
+    so every region job shares one computation per year.
+    """
+    module = calendars.getmodule(calendar)
+    if hasattr(module, "categories"):
+        params = inspect.signature(module.categories).parameters
+        superset = {
+            _: True for _ in params
+            if params[_].default is False or options.get(_) is not None
+        }
+        return superset, module.categories(**options)
+    return options, None
+
+
+def outputs(job):
+    """Split a job into (path, years, locale) output files."""
+    suffix = icalutil.COMPRESSORS.get(job.get("compress"), "")
+    if "{year}" in job["output"]:
+        paths = [
+            (job["output"].format(year=_, calendar=job["calendar"]), [_])
+            for _ in job["years"]
+        ]
+    else:
+        paths = [(job["output"].format(calendar=job["calendar"]), job["years"])]
+    return [
+        ({True: path, False: i18n.localpath(path, locale)}[locale is None] + suffix,
+         years, locale)
+        for path, years in paths for locale in job.get("locales") or [None]
+    ]
+
+
+def generate(calendar, year, options):
+    """Compute the events for a calendar and year as a list."""
+    return list(calendars.generate(calendar, year, dict(options)))
+
+
+def runtask(calendar, year, options, stats=False):
+    """Compute the events for a calendar and year in a worker process.
+
+    Returns (events, seconds, snapshot): with stats snapshot is the STATS
+    report of the worker for the parent to merge, otherwise None.
+    """
+    start = time.perf_counter()
+    if stats:
+        events, snapshot = icalutil.collect(generate, calendar, year, options)
+    else:
+        events, snapshot = generate(calendar, year, options), None
+    return events, time.perf_counter() - start, snapshot
+
+
+def sources(calendar, locale=None):
+    """Get the source files holding the rules (and strings) for a calendar."""
+    module = calendars.getmodule(calendar)
+    if hasattr(module, "sources"):
+        files = module.sources()
+    else:
+        files = [module.__file__, icalutil.__file__]
+    if locale is not None:
+        files = files + i18n.tablesources([locale])
+    return files
+
+
+def inputs(calendar, years, options, locale=None):
+    """Get the hash of everything an output file depends on."""
+    data = {"calendar": calendar, "years": years, "options": options}
+    if locale is not None:
+        data["locale"] = locale
+    return icalutil.inputhash(data, sources(calendar, locale))
+
+
+def writeoutput(path, calendar, events, created, state=None, hashed=None,
+                compress=None, locale=None, options=None, years=()):
+    """Atomically write a calendar file unless its events are unchanged.
+
+    options and years are those the events were generated with, for
+    headers that depend on them. With a locale the summaries are
+    translated while writing.
+    """
+    dirname = os.path.dirname(path)
+    if dirname:
+        os.makedirs(dirname, exist_ok=True)
+    header = calendars.header(calendar, options, years)
+    if locale is not None:
+        header = i18n.localheader(header, locale)
+    return icalutil.write_calendar(
+        path,
+        header,
+        lambda: {True: events, False: i18n.localize(events, locale)}[locale is None],
+        hashed,
+        created,
+        state,
+        compress=compress,
+    )
+
+
+def build(jobs, workers=None, report=sys.stderr, dtstamp=None, state=None):
+    """Run all jobs and return a list of (path, seconds) results.
+
+    dtstamp is a fixed CREATED/DTSTAMP value (see icalutil.resolve_stamp).
+    state is the path of a file recording hashes of the inputs and outputs;
+    outputs whose inputs are unchanged are not recomputed.
+    """
+    created = icalutil.resolve_stamp(
+        dtstamp, [_ for job in jobs for _ in sources(job["calendar"])]
+    )
+    if created is None and state is None:
+        created = icalutil.timestamp()
+    record = None if state is None else icalutil.readmanifest(state)
+
+    # expand jobs into unique (calendar, year, options) tasks
+    tasks = {}
+    pending = []
+    for job in jobs:
+        options, keep = taskoptions(job["calendar"], job["options"])
+        optkey = tuple(sorted(options.items()))
+        for path, years, locale in outputs(job):
+            hashed = inputs(job["calendar"], years, job["options"], locale)
+            if record is not None and icalutil.isfresh(record, path, hashed, created):
+                continue
+            keys = []
+            for year in years:
+                key = (job["calendar"], year, optkey)
+                tasks[key] = None
+                keys.append(key)
+            pending.append(
+                (path, job["calendar"], keys, keep, hashed, job.get("compress"),
+                 locale, job["options"], years)
+            )
+
+    # import the calendar modules before the pool starts so the workers
+    # inherit them, and share the date tables of every year in the build
+    for calendar in {_[0] for _ in tasks}:
+        calendars.getmodule(calendar)
+    years = sorted({_[1] for _ in tasks})
+    first, last = (max(1, years[0] - 1), years[-1] + 1) if years else (1, 0)
+
+    results = {}
+    elapsed = {}
+    done = []
+    with datetables.shared(first, last) as name, \
+            ProcessPoolExecutor(max_workers=workers,
+                                initializer=datetables.attach,
+                                initargs=(name,)) as pool:
+        futures = {
+            pool.submit(runtask, *key, icalutil.STATS.enabled): key
+            for key in sorted(tasks, key=lambda x: (PRIORITY.get(x[0], 9), x))
+        }
+        for future in as_completed(futures):
+            key = futures[future]
+            results[key], elapsed[key], snapshot = future.result()
+            if snapshot is not None:
+                icalutil.STATS.merge(snapshot)
+
+            # write every output whose years are all available
+            for item in [_ for _ in pending if all(k in results for k in _[2])]:
+                pending.remove(item)
+                (path, calendar, keys, keep, hashed, compress, locale, options,
+                 years) = item
+                start = time.perf_counter()
+                events = [
+                    _ for k in keys for _ in results[k]
+                    if keep is None or _.category in keep
+                ]
+                writeoutput(
+                    path, calendar, events, created, record, hashed, compress,
+                    locale, options, years,
+                )
+                wall = time.perf_counter() - start + sum(elapsed[k] for k in keys)
+                done.append((path, wall))
+                if report is not None:
+                    print("{:8.3f}s {}".format(wall, path), file=report)
+
+    if state is not None:
+        icalutil.writemanifest(state, record)
+    return done
+
+
+def runjob(job):
+    """Run a single job in this process and return a result record."""
+    start = time.perf_counter()
+    try:
+        job = normalize(job)
+        created = icalutil.resolve_stamp(job.get("dtstamp"), sources(job["calendar"]))
+        count = 0
+        computed = {}
+        for path, years, locale in outputs(job):
+            if tuple(years) not in computed:
+                computed[tuple(years)] = list(
+                    calendars.generate(job["calendar"], years, job["options"])
+                )
+            events = computed[tuple(years)]
+            writeoutput(path, job["calendar"], events, created,
+                        compress=job.get("compress"), locale=locale,
+                        options=job["options"], years=years)
+            count += len(events)
+    except (OSError, ValueError, KeyError, TypeError) as err:
+        return {"output": job.get("output"), "error": str(err)}
+    return {
+        "output": job["output"],
+        "events": count,
+        "seconds": round(time.perf_counter() - start, 6),
+    }
+
+
+def warmup():
+    """Import every calendar module so the first job does not pay for it."""
+    for calendar in calendars.MODULES:
+        try:
+            calendars.getmodule(calendar)
+        except ImportError:
+            pass
+
+
+def batch(ifile, ofile):
+    """Run newline delimited JSON jobs from ifile, writing results to ofile."""
+    for line in ifile:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            result = runjob(json.loads(line))
+        except ValueError as err:
+            result = {"error": "Invalid job: {}".format(err)}
+        ofile.write(json.dumps(result) + "\n")
+        ofile.flush()
+
+
+class BatchHandler(socketserver.StreamRequestHandler):
+    """Run the jobs sent over one socket connection."""
+
+    def handle(self):
+        """Read jobs until the client closes the connection."""
+        reader = io.TextIOWrapper(self.rfile, encoding="utf-8")
+        writer = io.TextIOWrapper(self.wfile, encoding="utf-8", write_through=True)
+        batch(reader, writer)
+        reader.detach()
+        writer.detach()
+
+
+def serve(path):
+    """Serve batch jobs on a Unix socket until interrupted."""
+    if os.path.exists(path):
+        os.unlink(path)
+    with socketserver.UnixStreamServer(path, BatchHandler) as server:
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+    os.unlink(path)
+
+
+def main():
+    """Parse our command line arguments and run the build."""
+    parser = argparse.ArgumentParser(
+        description="Build calendars listed in a manifest using a process pool."
+    )
+    parser.add_argument("manifest", nargs="?", help="JSON manifest of jobs")
+    parser.add_argument("-j", type=int, metavar="Workers", default=None,
+                        help="Number of worker processes (default: CPU count)")
+    parser.add_argument("--batch", action="store_true",
+                        help="Run newline delimited JSON jobs from stdin")
+    parser.add_argument("--socket", metavar="Path",
+                        help="With --batch, accept jobs on a Unix socket")
+    icalutil.add_stats_arguments(parser)
+    args = parser.parse_args()
+
+    if args.batch:
+        warmup()
+        # one report and profile for every job of the session
+        with icalutil.instrument(args):
+            if args.socket:
+                serve(args.socket)
+            else:
+                batch(sys.stdin, sys.stdout)
+        return
+    if args.manifest is None:
+        parser.error("a manifest is required unless --batch is given")
+
+    start = time.perf_counter()
+    try:
+        jobs, settings = loadmanifest(args.manifest)
+        # worker stats are merged into the parent's, the profile only
+        # covers this process
+        with icalutil.instrument(args):
+            done = build(
+                jobs, args.j, dtstamp=settings["dtstamp"], state=settings["state"]
+            )
+    except (OSError, ValueError, KeyError) as err:
+        sys.exit("Build failed: {}".format(err))
+    print(
+        "Built {} files in {:.3f}s".format(len(done), time.perf_counter() - start),
+        file=sys.stderr,
+    )
+
+
+# ---------------------------------------------------------------------------#
+
+
+if __name__ == "__main__":
+    main()
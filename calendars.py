@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Library interface to the calendar generators.
+
+Generate events in-process without parsing arguments or writing files:
+
+    import sys
+    import calendars
+    events = calendars.generate("usa", range(2024, 2027), {"weeks": True})
+    calendars.render_ics(events, sys.stdout, "usa")
+
+Calendars whose header depends on the options (the VTIMEZONE of astro's
+tz) need the same options and years passed to render_ics.
+"""
+import importlib
+
+import icalutil
+
+# ---------------------------------------------------------------------------#
+
+# calendar name -> module implementing generate() and HEADER, plus an
+# optional header(options, years) hook for headers that depend on the
+# options. astro and lunisolar are imported lazily since they require
+# PyEphem.
+MODULES = {
+    "usa": "usa",
+    "elca": "elca",
+    "astro": "astro",
+    "lunisolar": "lunisolar",
+}
+
+HEADER = """BEGIN:VCALENDAR
+VERSION:2.0
+CALSCALE:GREGORIAN
+PRODID:-//Adyeths//python ical generator//EN
+CREATED;VALUE=DATE:{}
+"""
+
+# ---------------------------------------------------------------------------#
+
+
+def getmodule(calendar):
+    """Return the generator module for a calendar name."""
+    if calendar not in MODULES:
+        raise ValueError("Unknown calendar: {}".format(calendar))
+    return importlib.import_module(MODULES[calendar])
+
+
+def generate(calendar, years, options=None):
+    """Return an iterator of events for calendar over one or more years.
+
+    options is a dict of keyword arguments for the calendar's generate().
+    """
+    return getmodule(calendar).generate(years, **(options or {}))
+
+
+def header(calendar, options=None, years=()):
+    """Get the header of a calendar generated with options over years."""
+    module = getmodule(calendar)
+    if hasattr(module, "header"):
+        return module.header(options or {}, years)
+    return module.HEADER
+
+
+def render_ics(events, stream, calendar=None, created=None, options=None,
+               years=()):
+    """Write events to stream as an icalendar file.
+
+    options and years are those given to generate().
+    """
+    text = HEADER if calendar is None else header(calendar, options, years)
+    icalutil.render_ics(events, stream, text, created)
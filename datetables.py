@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Precomputed date tables shared with build worker processes.
+
+buildall computes the Easter date and the January 1 weekday and leap
+flag of every year in a build once, in the parent, and publishes them as
+typed arrays in a multiprocessing.shared_memory block. Pool workers
+attach to the block by name and read the arrays in place, so no worker
+recomputes or copies them:
+
+    with datetables.shared(1993, 2100) as name:
+        with ProcessPoolExecutor(initializer=datetables.attach,
+                                 initargs=(name,)) as pool:
+            ...
+
+Outside a pool (the scripts run directly, buildall --batch) nothing is
+attached and the values are computed on demand as before, and
+multiprocessing is never imported.
+"""
+import contextlib
+import datetime
+from array import array
+from math import floor
+
+# ---------------------------------------------------------------------------#
+
+# days before the first of each month in a common year
+MONTHDAYS = (0, 31, 59, 90, 120, 151, 181, 212, 243, 273, 304, 334)
+
+# block layout: int32 (first year, count), int32 easter ordinals,
+# uint8 january 1 iso weekday | leap << 3
+HEADER = 8
+
+# the attached tables: (first year, easter ordinals, january 1 flags)
+TABLE = None
+
+# keeps the attached block open for the life of the worker
+BLOCK = None
+
+# ---------------------------------------------------------------------------#
+
+
+def computeeaster(year):
+    """Get date as ordinal for easter in a given year using Meeus algorithm."""
+    vrh = ((19 * (year % 19)) + floor(year / 100) - int(
+        floor(year / 100) / 4) - (int((floor(year / 100) - int(
+            (floor(year / 100) + 8) / 25) + 1) / 3)) + 15) % 30
+    vrv = (32 + (2 * int(floor(year / 100) % 4)) + (2 * int(
+        (year % 100) / 4)) - vrh - ((year % 100) % 4)) % 7
+    vrm = int(((year % 19) + (11 * vrh) + (22 * vrv)) / 451)
+
+    month = int((vrh + vrv + (7 * vrm) + 114) / 31)
+    day = ((vrh + vrv - (7 * vrm) + 114) % 31) + 1
+    return datetime.date(year, month, day).toordinal()
+
+
+def computeflags(year):
+    """Get the january 1 iso weekday of a year with the leap flag in bit 3."""
+    leap = {True: 8, False: 0}[
+        year % 4 == 0 and (year % 100 != 0 or year % 400 == 0)
+    ]
+    return datetime.date(year, 1, 1).isoweekday() | leap
+
+
+def lookup(year):
+    """Get the attached (easter, flags) of a year, or None."""
+    if TABLE is None:
+        return None
+    first, easters, flags = TABLE
+    idx = year - first
+    if not 0 <= idx < len(easters):
+        return None
+    return easters[idx], flags[idx]
+
+
+def calceaster(year):
+    """Get date as ordinal for easter, from the attached table if possible."""
+    found = lookup(year)
+    if found is None:
+        return computeeaster(year)
+    return found[0]
+
+
+def monthstart(year, month):
+    """Get (ordinal, iso weekday) of the first day of a month."""
+    found = lookup(year)
+    flags = computeflags(year) if found is None else found[1]
+    days = MONTHDAYS[month - 1] + {True: 1, False: 0}[month > 2 and flags > 7]
+    prev = year - 1
+    jan1 = 365 * prev + prev // 4 - prev // 100 + prev // 400 + 1
+    return jan1 + days, ((flags & 7) - 1 + days) % 7 + 1
+
+
+def publish(first, last):
+    """Build the tables for first..last in a new shared memory block.
+
+    Returns the block, which the caller must release(), or None when
+    the range is empty or shared memory is not available.
+    """
+    from multiprocessing import shared_memory
+
+    count = last - first + 1
+    if count < 1:
+        return None
+    easters = array("i", (computeeaster(_) for _ in range(first, last + 1)))
+    flags = array("B", (computeflags(_) for _ in range(first, last + 1)))
+    try:
+        shm = shared_memory.SharedMemory(create=True, size=HEADER + 5 * count)
+    except OSError:
+        return None
+    shm.buf[:HEADER] = array("i", (first, count)).tobytes()
+    shm.buf[HEADER:HEADER + 4 * count] = easters.tobytes()
+    shm.buf[HEADER + 4 * count:HEADER + 5 * count] = flags.tobytes()
+    return shm
+
+
+def attach(name):
+    """Attach this process to the tables published under name.
+
+    Used as a process pool initializer; name may be None when nothing
+    was published.
+    """
+    global TABLE, BLOCK
+    if name is None:
+        return
+    from multiprocessing import shared_memory
+
+    try:
+        shm = shared_memory.SharedMemory(name=name)
+    except OSError:
+        return
+    first, count = shm.buf[:HEADER].cast("i")
+    TABLE = (
+        first,
+        shm.buf[HEADER:HEADER + 4 * count].cast("i"),
+        shm.buf[HEADER + 4 * count:HEADER + 5 * count],
+    )
+    BLOCK = shm
+
+
+def release(shm):
+    """Close and remove a block returned by publish()."""
+    if shm is not None:
+        shm.close()
+        shm.unlink()
+
+
+@contextlib.contextmanager
+def shared(first, last):
+    """Publish the tables for first..last, yielding the name to attach."""
+    shm = publish(first, last)
+    try:
+        yield None if shm is None else shm.name
+    finally:
+        release(shm)
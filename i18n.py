@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Render event summaries in other languages.
+
+Generators build summaries with text(): the result is the English summary
+(so UIDs and the default output are unchanged) that also remembers its
+key and arguments. localize() renders the same events in another locale
+from the string tables in data/strings-{locale}.csv, so dates are only
+computed once however many languages are written:
+
+    events = list(elca.generate(2024))
+    for locale in ("en", "es", "de"):
+        with open("elca-2024.{}.ics".format(locale), "w") as ofile:
+            elca.render_ics(i18n.localize(events, locale), ofile)
+
+A key is an English template such as "{ord} Sunday of Easter 🅦 {year}"
+or a plain English name. An "ord" argument is written with the ordinal
+rule of the locale, other string arguments are translated too, and
+anything missing from a table is left in English.
+"""
+import functools
+
+import icalutil
+import ruledata
+
+# ---------------------------------------------------------------------------#
+
+LOCALES = ("en", "es", "de")
+
+# English ordinal suffixes, also used by idxvalue in elca.py
+SUFFIXES = {1: "st", 2: "nd", 3: "rd", 21: "st", 22: "nd", 23: "rd", 31: "st",
+            32: "nd", 33: "rd"}
+
+# ordinal rules
+ORDINALS = {
+    "en": lambda num: "{}{}".format(num, SUFFIXES.get(num, "th")),
+    "es": "{}.º".format,
+    "de": "{}.".format,
+}
+
+# locale -> {key: template}, loaded on first use
+TABLES = {"en": {}}
+
+# ---------------------------------------------------------------------------#
+
+
+class Text(str):
+    """An English summary that remembers its key and arguments.
+
+    base is the summary this one decorates (see variant), if any.
+    """
+
+    def __new__(cls, value, key=None, args=None, base=None):
+        self = super().__new__(cls, value)
+        self.key = value if key is None else key
+        self.args = args or {}
+        self.base = base
+        return self
+
+    def __reduce__(self):
+        return (Text, (str(self), self.key, self.args, self.base))
+
+
+def table(locale):
+    """Get the string table of a locale."""
+    if locale not in ORDINALS:
+        raise ValueError("Unknown locale: {}".format(locale))
+    if locale not in TABLES:
+        name = "strings-{}".format(locale)
+        TABLES[locale] = dict(ruledata.load(name)[name])
+    return TABLES[locale]
+
+
+def tablesources(locales):
+    """Get the string table files used by locales."""
+    return [
+        _ for locale in locales if locale != "en"
+        for _ in ruledata.sources("strings-{}".format(locale))
+    ]
+
+
+def fmt(key, args, locale):
+    """Format a key and its arguments in a locale."""
+    template = table(locale).get(key, key)
+    if not args:
+        return template
+    values = {}
+    for name, value in args.items():
+        if name == "ord":
+            values[name] = ORDINALS[locale](value)
+        elif isinstance(value, tuple):
+            values[name] = ", ".join(translate(_, locale) for _ in value)
+        elif isinstance(value, str):
+            values[name] = translate(value, locale)
+        else:
+            values[name] = value
+    return template.format(**values)
+
+
+def text(key, **args):
+    """Build a summary from an English template and its arguments."""
+    return Text(fmt(key, args, "en"), key, args)
+
+
+def variant(key, base, **args):
+    """Build a summary decorating another, e.g. "{name} (Transferred)".
+
+    The result keeps the rule identity of base, see ident().
+    """
+    return Text(fmt(key, args, "en"), key, args, base)
+
+
+def ident(summary):
+    """Get the identity of the rule behind a summary, used for UIDs.
+
+    This is the English key plus any name arguments (a planet, a month),
+    so the numbers filled into a template or a decoration added by
+    variant() do not change it. A plain summary, such as a row of a rule
+    table, is its own key.
+    """
+    if not isinstance(summary, Text):
+        return str(summary)
+    if summary.base is not None:
+        return ident(summary.base)
+    names = [
+        ", ".join(value) if isinstance(value, tuple) else value
+        for _, value in sorted(summary.args.items())
+        if isinstance(value, (str, tuple))
+    ]
+    return "\n".join([summary.key] + names)
+
+
+def translate(summary, locale):
+    """Get a summary in a locale, falling back to English."""
+    if locale == "en":
+        return str(summary)
+    if isinstance(summary, Text):
+        return fmt(summary.key, summary.args, locale)
+    return table(locale).get(summary, summary)
+
+
+def localize(events, locale):
+    """Yield events with their summaries in a locale."""
+    for i in events:
+        yield i._replace(summary=translate(i.summary, locale))
+
+
+def localheader(header, locale):
+    """Get a calendar header with the PRODID language of a locale."""
+    return header.replace("//EN\n", "//{}\n".format(locale.upper()))
+
+
+def localpath(path, locale):
+    """Get the output path for a locale, e.g. elca-2024.es.ics."""
+    base, dot, ext = path.rpartition(".ics")
+    return "{}.{}{}{}".format(base, locale, dot, ext)
+
+
+def add_locale_argument(parser):
+    """Add the -l option selecting the output languages."""
+    parser.add_argument(
+        "-l",
+        dest="locales",
+        action="append",
+        choices=LOCALES,
+        metavar="Locale",
+        help="Write the calendar in this language, e.g. elca-2024.es.ics "
+        "(repeatable: {})".format(", ".join(LOCALES)),
+    )
+
+
+def output(path, header, getevents, args, inputs, sources, categories=()):
+    """Write a calendar file through icalutil.output once per -l locale.
+
+    getevents is only called once, every locale renders the same events.
+    """
+    if not args.locales:
+        return icalutil.output(
+            path, header, getevents, args, inputs, sources, categories
+        )
+    if len(args.locales) > 1 and args.delta is not None:
+        raise ValueError("--delta can only be used with a single locale!")
+    events = []
+
+    def localevents(locale):
+        if not events:
+            events.extend(getevents())
+        return localize(events, locale)
+
+    # one stats report and profile for every locale
+    with icalutil.instrument(args):
+        for locale in args.locales:
+            icalutil.output(
+                localpath(path, locale),
+                localheader(header, locale),
+                functools.partial(localevents, locale),
+                args,
+                dict(inputs, locale=locale),
+                sources + tablesources([locale]),
+                categories,
+            )
@@ -0,0 +1,1005 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Shared helpers for building and writing icalendar files."""
+import contextlib
+import datetime
+import functools
+import hashlib
+import io
+import itertools
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from bisect import bisect_right
+from collections import namedtuple
+
+# ---------------------------------------------------------------------------#
+
+FOOTER = "END:VCALENDAR"
+
+VEVENT = """BEGIN:VEVENT
+UID:{}
+DTSTART{}
+DTEND{}
+SUMMARY:{}
+DTSTAMP:{}
+TRANSP:TRANSPARENT
+STATUS:CONFIRMED
+END:VEVENT"""
+
+# A single calendar entry.
+#   uid      -- unique identifier for the event
+#   start    -- datetime.date for all day events, datetime.datetime for
+#               timed events (naive for UTC, or aware in a ZoneInfo zone)
+#   end      -- same type as start
+#   summary  -- event text
+#   category -- short name of the group the event belongs to
+Event = namedtuple("Event", "uid start end summary category")
+
+# placeholder for CREATED/DTSTAMP while hashing rendered events.
+STAMPMARK = "\x00DTSTAMP\x00"
+
+# compression method -> file name suffix
+COMPRESSORS = {"gzip": ".gz", "zstd": ".zst"}
+
+# size of the chunks handed to the background writer
+CHUNKSIZE = 1 << 16
+
+# set while an instrument() block is collecting stats or profiling
+INSTRUMENTED = False
+
+# numbers the temporary files created by this process
+TMPCOUNT = itertools.count()
+
+# ---------------------------------------------------------------------------#
+
+
+class Stats:
+    """Per stage timers and counters for a run.
+
+    Disabled by default; timer() then returns a shared no-op context and
+    count() returns immediately, so instrumented code pays almost nothing.
+    Timers are inclusive: a stage timed inside another counts in both.
+    Events are generated lazily while they are serialized, so the
+    serialize stage includes the rules/easter/ephem stages; io is the time
+    the writer thread spends compressing and writing.
+    """
+
+    NULLTIMER = contextlib.nullcontext()
+
+    def __init__(self):
+        self.enabled = False
+        self.timers = {}
+        self.calls = {}
+        self.counters = {}
+
+    def enable(self):
+        """Start collecting, discarding anything collected before."""
+        self.reset()
+        self.enabled = True
+
+    def disable(self):
+        """Stop collecting."""
+        self.enabled = False
+
+    def reset(self):
+        """Discard all timers and counters."""
+        self.timers = {}
+        self.calls = {}
+        self.counters = {}
+
+    def timer(self, stage):
+        """Return a context manager adding its duration to stage."""
+        if not self.enabled:
+            return self.NULLTIMER
+        return self._timer(stage)
+
+    @contextlib.contextmanager
+    def _timer(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - start)
+
+    def add(self, stage, seconds, calls=1):
+        """Add time measured elsewhere (e.g. by a writer thread) to stage."""
+        if self.enabled:
+            self.timers[stage] = self.timers.get(stage, 0.0) + seconds
+            self.calls[stage] = self.calls.get(stage, 0) + calls
+
+    def count(self, name, amount=1):
+        """Add amount to a counter."""
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def merge(self, report):
+        """Add a report() collected in another process, e.g. a pool worker."""
+        for stage, timer in report["timers"].items():
+            self.add(stage, timer["seconds"], timer["calls"])
+        for name, amount in report["counters"].items():
+            self.count(name, amount)
+
+    def report(self):
+        """Return the collected data as a JSON serializable dict."""
+        return {
+            "timers": {
+                _: {"seconds": self.timers[_], "calls": self.calls[_]}
+                for _ in sorted(self.timers)
+            },
+            "counters": dict(sorted(self.counters.items())),
+        }
+
+
+# shared instance used by all of the generators
+STATS = Stats()
+
+# ---------------------------------------------------------------------------#
+
+
+def timestamp(when=None):
+    """Format a datetime for use as CREATED/DTSTAMP."""
+    if when is None:
+        when = datetime.datetime.now()
+    return when.strftime("%Y%m%dT%H%M%SZ")
+
+
+def resolve_stamp(value=None, sources=()):
+    """Get a deterministic CREATED/DTSTAMP value, or None for the current time.
+
+    value may be a timestamp in YYYYMMDDTHHMMSSZ form or "source" to use the
+    newest modification time of the source files. Without a value the
+    SOURCE_DATE_EPOCH environment variable is honoured.
+    """
+    if value is None:
+        epoch = os.environ.get("SOURCE_DATE_EPOCH")
+        if epoch is None:
+            return None
+        when = datetime.datetime.utcfromtimestamp(int(epoch))
+    elif value == "source":
+        when = datetime.datetime.utcfromtimestamp(
+            int(max(os.stat(_).st_mtime for _ in sources))
+        )
+    else:
+        when = datetime.datetime.strptime(value, "%Y%m%dT%H%M%SZ")
+    return timestamp(when)
+
+
+def fmtdate(dte):
+    """Format the value (and parameters) of a DTSTART/DTEND property."""
+    if isinstance(dte, datetime.datetime):
+        if dte.tzinfo is not None:
+            return ";TZID={}:{}".format(
+                dte.tzinfo.key, dte.strftime("%Y%m%dT%H%M%S")
+            )
+        return dte.strftime(":%Y%m%dT%H%M%SZ")
+    return dte.strftime(";VALUE=DATE:%Y%m%d")
+
+
+@functools.lru_cache(maxsize=None)
+def zone(key):
+    """Get the ZoneInfo of a time zone key, importing zoneinfo on first use."""
+    from zoneinfo import ZoneInfo
+
+    return ZoneInfo(key)
+
+
+def _tzinfo(tzone, instant):
+    """Get (utcoffset, is dst, name) of a ZoneInfo at a UTC instant."""
+    local = instant.replace(tzinfo=datetime.timezone.utc).astimezone(tzone)
+    return (local.utcoffset(), bool(local.dst()), local.tzname())
+
+
+@functools.lru_cache(maxsize=32)
+def tztransitions(key, first, last):
+    """Get the transitions of a time zone between two years (inclusive).
+
+    Returns (instants, infos): instants is a sorted tuple of naive UTC
+    datetimes where the zone changes and infos holds one more entry than
+    instants, the (utcoffset, is dst, name) in effect before each instant
+    and after the last one. Computed once per zone and range.
+    """
+    tzone = zone(key)
+    day = datetime.timedelta(days=1)
+    instant = datetime.datetime(first, 1, 1) - day
+    end = datetime.datetime(last + 1, 1, 1) + day
+    instants = []
+    infos = [_tzinfo(tzone, instant)]
+    while instant < end:
+        nxt = instant + day
+        info = _tzinfo(tzone, nxt)
+        if info != infos[-1]:
+            # narrow the change down to the second
+            low, high = instant, nxt
+            while high - low > datetime.timedelta(seconds=1):
+                mid = low + (high - low) / 2
+                mid = mid.replace(microsecond=0)
+                if _tzinfo(tzone, mid) == infos[-1]:
+                    low = mid
+                else:
+                    high = mid
+            instants.append(high)
+            infos.append(info)
+        instant = nxt
+    return tuple(instants), tuple(infos)
+
+
+def tolocal(dte, key, first, last):
+    """Convert a naive UTC datetime to the local time of a zone.
+
+    Uses the memoized transition table for the years first to last instead
+    of a zoneinfo lookup per call.
+    """
+    instants, infos = tztransitions(key, first, last)
+    offset = infos[bisect_right(instants, dte)][0]
+    return (dte + offset).replace(tzinfo=zone(key))
+
+
+def _fmtoffset(offset):
+    """Format a UTC offset as used by TZOFFSETFROM/TZOFFSETTO."""
+    seconds = int(offset.total_seconds())
+    sign = "-" if seconds < 0 else "+"
+    hours, rest = divmod(abs(seconds), 3600)
+    minutes, seconds = divmod(rest, 60)
+    if seconds:
+        return "{}{:02d}{:02d}{:02d}".format(sign, hours, minutes, seconds)
+    return "{}{:02d}{:02d}".format(sign, hours, minutes)
+
+
+@functools.lru_cache(maxsize=32)
+def vtimezone(key, first, last):
+    """Get a VTIMEZONE component covering the years first to last."""
+    instants, infos = tztransitions(key, first, last)
+    lines = ["BEGIN:VTIMEZONE", "TZID:{}".format(key)]
+    # start a day early since UTC events on Jan 1 may be Dec 31 locally
+    start = datetime.datetime(first, 1, 1) - datetime.timedelta(days=1)
+    onsets = [(start, infos[0], infos[0])]
+    for idx, instant in enumerate(instants):
+        # local time before the change, as RFC 5545 requires
+        onsets.append((instant + infos[idx][0], infos[idx], infos[idx + 1]))
+    for onset, before, after in onsets:
+        kind = "DAYLIGHT" if after[1] else "STANDARD"
+        lines.extend([
+            "BEGIN:{}".format(kind),
+            onset.strftime("DTSTART:%Y%m%dT%H%M%S"),
+            "TZOFFSETFROM:{}".format(_fmtoffset(before[0])),
+            "TZOFFSETTO:{}".format(_fmtoffset(after[0])),
+            "TZNAME:{}".format(after[2]),
+            "END:{}".format(kind),
+        ])
+    lines.append("END:VTIMEZONE")
+    return "\n".join(lines) + "\n"
+
+
+def stableuid(prefix, year, key, seen):
+    """Get a UID derived from the rule behind an event, not its position.
+
+    key identifies the rule (see i18n.ident) rather than the rendered
+    text, so a changed date or summary of the same rule keeps its UID and
+    shows up as a SEQUENCE bump. seen counts the keys already used in
+    this group so repeated rules (such as moon phases) still get distinct
+    UIDs. Adding or removing a rule does not change the UIDs of the other
+    events.
+    """
+    count = seen[key] = seen.get(key, 0) + 1
+    digest = hashlib.sha1("{}\n{}".format(key, count).encode("utf-8"))
+    return "{}{}-{}@adyeths".format(prefix, year, digest.hexdigest()[:12])
+
+
+def withmethod(header, method):
+    """Add an iTIP METHOD property to a calendar header."""
+    return header.replace(
+        "CALSCALE:GREGORIAN\n", "CALSCALE:GREGORIAN\nMETHOD:{}\n".format(method)
+    )
+
+
+def formatevent(event, created, props=None):
+    """Format one event as a VEVENT with CRLF line endings."""
+    text = VEVENT.format(
+        event.uid, fmtdate(event.start), fmtdate(event.end), event.summary, created
+    )
+    if props and event.uid in props:
+        text = text.replace(
+            "\nEND:VEVENT", "\n{}\nEND:VEVENT".format(props[event.uid])
+        )
+    return text.replace("\n", "\r\n") + "\r\n"
+
+
+def render_ics(events, stream, header, created=None, props=None):
+    """Write events to stream as a complete icalendar file.
+
+    props optionally maps a UID to extra property lines for that event.
+    """
+    if created is None:
+        created = timestamp()
+
+    # ical header
+    stream.write(header.format(created).replace("\n", "\r\n"))
+
+    count = 0
+    for i in events:
+        count += 1
+        stream.write(formatevent(i, created, props))
+
+    # ical footer
+    stream.write(FOOTER.replace("\n", "\r\n"))
+    STATS.count("events", count)
+
+
+def parse_ics(stream):
+    """Yield a dict of property name to unfolded line for each VEVENT.
+
+    Lines are read one at a time so large files are never held in memory.
+    """
+    event = None
+    last = None
+    for line in stream:
+        line = line.rstrip("\r\n")
+        if line[:1] in (" ", "\t"):
+            # folded continuation line
+            if event is not None and last is not None:
+                event[last] += line[1:]
+        elif line == "BEGIN:VEVENT":
+            event = {}
+            last = None
+        elif line == "END:VEVENT":
+            if event is not None:
+                yield event
+            event = None
+        elif event is not None:
+            last = line.partition(":")[0].split(";")[0].upper()
+            event[last] = line
+
+
+def propvalue(event, name, default=None):
+    """Get the value of a property parsed by parse_ics."""
+    if name not in event:
+        return default
+    return event[name].partition(":")[2]
+
+
+def diff_events(previous, events, modified):
+    """Compare events with the VEVENTs of a previous file.
+
+    previous maps UID to the properties from parse_ics and is consumed.
+    Returns (props, changed, removed): props maps every UID to its
+    SEQUENCE/LAST-MODIFIED lines, changed lists the new or modified
+    events and removed maps the UIDs that disappeared to their old
+    properties.
+    """
+    props = {}
+    changed = []
+    for i in events:
+        old = previous.pop(i.uid, None)
+        lines = (
+            "DTSTART" + fmtdate(i.start),
+            "DTEND" + fmtdate(i.end),
+            "SUMMARY:" + i.summary,
+        )
+        if old is None:
+            sequence, lastmod = 0, modified
+            changed.append(i)
+        elif tuple(old.get(_) for _ in ("DTSTART", "DTEND", "SUMMARY")) == lines:
+            sequence = int(propvalue(old, "SEQUENCE", 0))
+            lastmod = propvalue(old, "LAST-MODIFIED", modified)
+        else:
+            sequence = int(propvalue(old, "SEQUENCE", 0)) + 1
+            lastmod = modified
+            changed.append(i)
+        props[i.uid] = "SEQUENCE:{}\nLAST-MODIFIED:{}".format(sequence, lastmod)
+    return props, changed, previous
+
+
+def render_cancel(removed, stream, header, created):
+    """Write an iTIP METHOD:CANCEL calendar for removed events."""
+    header = withmethod(header, "CANCEL")
+    stream.write(header.format(created).replace("\n", "\r\n"))
+    for old in removed.values():
+        lines = ["BEGIN:VEVENT"]
+        lines.extend(
+            old[_] for _ in ("UID", "DTSTART", "DTEND", "SUMMARY") if _ in old
+        )
+        lines.append("DTSTAMP:{}".format(created))
+        lines.append("SEQUENCE:{}".format(int(propvalue(old, "SEQUENCE", 0)) + 1))
+        lines.append("STATUS:CANCELLED")
+        lines.append("END:VEVENT")
+        stream.write("\r\n".join(lines) + "\r\n")
+    stream.write(FOOTER.replace("\n", "\r\n"))
+
+
+def write_delta(path, header, changed, removed, created, props=None):
+    """Write the changed events as METHOD:PUBLISH and removals as CANCEL.
+
+    Cancellations go to a second file with -cancel added to the name.
+    """
+    buf = io.StringIO()
+    render_ics(changed, buf, withmethod(header, "PUBLISH"), created, props)
+    with atomic_open(path, newline="") as ofile:
+        ofile.write(buf.getvalue().replace(STAMPMARK, created))
+    if removed:
+        root, ext = os.path.splitext(path)
+        with atomic_open("{}-cancel{}".format(root, ext), newline="") as ofile:
+            render_cancel(removed, ofile, header, created)
+
+
+def yearlist(years):
+    """Accept a single year or an iterable of years."""
+    if isinstance(years, int):
+        return [years]
+    return list(years)
+
+
+def mktemp(path):
+    """Create a temporary file next to path, returning (fd, name).
+
+    Works like tempfile.mkstemp with names made of the process id and a
+    counter, which spares every run the import of tempfile.
+    """
+    dirname = os.path.dirname(os.path.abspath(path))
+    while True:
+        tmpname = os.path.join(dirname, ".{}.{}.{}.tmp".format(
+            os.path.basename(path), os.getpid(), next(TMPCOUNT)
+        ))
+        try:
+            fdesc = os.open(tmpname, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        except FileExistsError:
+            continue
+        return fdesc, tmpname
+
+
+@contextlib.contextmanager
+def atomic_open(path, mode="w", **kwargs):
+    """Open a temporary file next to path and rename it into place on success.
+
+    Readers never see a partially written file.
+    """
+    fdesc, tmpname = mktemp(path)
+    try:
+        with os.fdopen(fdesc, mode, **kwargs) as ofile:
+            yield ofile
+        os.chmod(tmpname, 0o644)
+        os.replace(tmpname, path)
+    except BaseException:
+        os.unlink(tmpname)
+        raise
+
+
+def filehash(paths):
+    """Get a combined sha256 hex digest of the contents of files."""
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, "rb") as ifile:
+            digest.update(ifile.read())
+    return digest.hexdigest()
+
+
+def inputhash(inputs, sources=()):
+    """Get a sha256 hex digest of the rule inputs for an output file.
+
+    inputs is a JSON serializable description of the calendar, years and
+    options. sources are the files containing the generator rules.
+    """
+    digest = hashlib.sha256(json.dumps(inputs, sort_keys=True).encode("utf-8"))
+    digest.update(filehash(sources).encode("ascii"))
+    return digest.hexdigest()
+
+
+def readmanifest(path):
+    """Read a build manifest, returning an empty one if it does not exist."""
+    try:
+        with open(path) as ifile:
+            return json.load(ifile)
+    except FileNotFoundError:
+        return {}
+
+
+def writemanifest(path, manifest):
+    """Atomically write a build manifest."""
+    with atomic_open(path) as ofile:
+        json.dump(manifest, ofile, indent=1, sort_keys=True)
+
+
+def isfresh(manifest, path, inputs, created=None):
+    """Check if an output is up to date with its inputs.
+
+    created is the deterministic stamp the file should carry, or None if
+    any stamp is acceptable.
+    """
+    entry = manifest.get(path)
+    if entry is None or entry["inputs"] != inputs:
+        return False
+    if created is not None and entry["stamp"] != created:
+        return False
+    try:
+        info = os.stat(path)
+    except FileNotFoundError:
+        return False
+    return info.st_size == entry["size"] and info.st_mtime_ns == entry["mtime"]
+
+
+def _compressor(raw, compress):
+    """Wrap a binary file object in a streaming compressor."""
+    if compress is None:
+        return raw
+    if compress == "gzip":
+        import gzip
+
+        # fixed mtime and no file name keep the output reproducible
+        return gzip.GzipFile(filename="", mode="wb", fileobj=raw, mtime=0)
+    if compress == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            raise ValueError(
+                "zstd compression requires the zstandard package"
+            ) from None
+        return zstandard.ZstdCompressor().stream_writer(raw, closefd=False)
+    raise ValueError("Unknown compression: {}".format(compress))
+
+
+def openread(path):
+    """Open a possibly compressed calendar file for reading as text."""
+    if path.endswith(COMPRESSORS["gzip"]):
+        import gzip
+
+        return gzip.open(path, "rt", encoding="utf-8", newline="")
+    if path.endswith(COMPRESSORS["zstd"]):
+        import zstandard
+
+        raw = open(path, "rb")
+        return io.TextIOWrapper(
+            zstandard.ZstdDecompressor().stream_reader(raw, closefd=True),
+            encoding="utf-8",
+            newline="",
+        )
+    return open(path, newline="", encoding="utf-8")
+
+
+class BackgroundWriter:
+    """Write byte chunks to a file from a separate thread.
+
+    Chunks go through a bounded queue so generation can continue while the
+    writer thread compresses and writes, and blocks if the writer falls
+    behind. The file is written to a temporary name and only renamed into
+    place by close(commit=True).
+    """
+
+    def __init__(self, path, compress=None, maxsize=16):
+        self.path = path
+        fdesc, self.tmpname = mktemp(path)
+        self.raw = os.fdopen(fdesc, "wb")
+        try:
+            self.out = _compressor(self.raw, compress)
+        except ValueError:
+            self.raw.close()
+            os.unlink(self.tmpname)
+            raise
+        self.queue = queue.Queue(maxsize)
+        self.error = None
+        self.seconds = 0.0
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        """Take chunks off the queue until the end marker."""
+        while True:
+            chunk = self.queue.get()
+            if chunk is None:
+                break
+            if self.error is not None:
+                continue
+            start = time.perf_counter()
+            try:
+                self.out.write(chunk)
+            except Exception as err:  # reported to the producer by close()
+                self.error = err
+            self.seconds += time.perf_counter() - start
+
+    def write(self, chunk):
+        """Queue a chunk of bytes for writing."""
+        if self.error is not None:
+            raise self.error
+        self.queue.put(chunk)
+
+    def close(self, commit=True):
+        """Finish writing; rename into place if commit, else discard."""
+        self.queue.put(None)
+        self.thread.join()
+        try:
+            if self.out is not self.raw:
+                self.out.close()
+            self.raw.close()
+            if self.error is not None:
+                raise self.error
+            if commit:
+                os.chmod(self.tmpname, 0o644)
+                os.replace(self.tmpname, self.path)
+                return
+        except BaseException:
+            os.unlink(self.tmpname)
+            raise
+        os.unlink(self.tmpname)
+
+
+class ChunkStream:
+    """Text stream for render_ics feeding a BackgroundWriter.
+
+    Text is gathered into CHUNKSIZE pieces, hashed with the STAMPMARK
+    placeholder still in place, and encoded with the real stamp.
+    """
+
+    def __init__(self, writer, stamp):
+        self.writer = writer
+        self.stamp = stamp.encode("utf-8")
+        self.mark = STAMPMARK.encode("utf-8")
+        self.digest = hashlib.sha256()
+        self.pending = []
+        self.size = 0
+
+    def write(self, text):
+        """Buffer text, handing full chunks to the writer."""
+        self.pending.append(text)
+        self.size += len(text)
+        if self.size >= CHUNKSIZE:
+            self.flush()
+
+    def flush(self):
+        """Hand any buffered text to the writer."""
+        if not self.pending:
+            return
+        data = "".join(self.pending).encode("utf-8")
+        self.pending = []
+        self.size = 0
+        self.digest.update(data)
+        self.writer.write(data.replace(self.mark, self.stamp))
+
+
+class SinkStream:
+    """Byte stream for one output of write_calendars.
+
+    Takes each piece already encoded twice, with the STAMPMARK placeholder
+    for hashing and with the real stamp for writing, so bytes shared by
+    several outputs are only encoded once.
+    """
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.digest = hashlib.sha256()
+        self.pending = []
+        self.size = 0
+
+    def write(self, marked, stamped):
+        """Buffer a piece, handing full chunks to the writer."""
+        self.digest.update(marked)
+        self.pending.append(stamped)
+        self.size += len(stamped)
+        if self.size >= CHUNKSIZE:
+            self.flush()
+
+    def flush(self):
+        """Hand any buffered bytes to the writer."""
+        if not self.pending:
+            return
+        self.writer.write(b"".join(self.pending))
+        self.pending = []
+        self.size = 0
+
+
+def _commit(path, writer, digest, inputs, created, manifest, stamp):
+    """Finish a BackgroundWriter unless its events are unchanged.
+
+    Records the output in manifest and returns True if it was written.
+    """
+    # keep the existing file if only the stamp would change
+    entry = None if manifest is None else manifest.get(path)
+    written = not (entry is not None and entry["events"] == digest and (
+        created is None or entry["stamp"] == created
+    ) and os.path.exists(path))
+    writer.close(commit=written)
+    STATS.add("io", writer.seconds)
+    if written:
+        STATS.count("bytes", os.path.getsize(path))
+    else:
+        stamp = entry["stamp"]
+
+    if manifest is not None:
+        info = os.stat(path)
+        manifest[path] = {
+            "inputs": inputs,
+            "events": digest,
+            "stamp": stamp,
+            "size": info.st_size,
+            "mtime": info.st_mtime_ns,
+        }
+    return written
+
+
+def write_calendar(path, header, getevents, inputs=None, created=None,
+                   manifest=None, update=False, delta=None, compress=None):
+    """Write a calendar file, skipping unchanged outputs.
+
+    getevents is called to produce the events. If manifest is given and
+    the inputs hash matches the recorded one nothing is computed. If the
+    generated events are identical to the recorded ones the file is left
+    alone. Returns True if the file was written.
+
+    With update the existing file is compared by UID and changed events
+    get their SEQUENCE bumped. delta names a file to receive only the
+    changed events (see write_delta).
+
+    Events are serialized while they are generated and handed to a
+    BackgroundWriter, which compresses them when compress is "gzip" or
+    "zstd".
+    """
+    if manifest is not None and inputs is not None:
+        if isfresh(manifest, path, inputs, created):
+            return False
+
+    events = getevents()
+    props = None
+    if update or delta is not None:
+        events = list(events)
+        previous = {}
+        if os.path.exists(path):
+            with openread(path) as ifile:
+                previous = {propvalue(_, "UID"): _ for _ in parse_ics(ifile)}
+        props, changed, removed = diff_events(previous, events, STAMPMARK)
+        if delta is not None:
+            write_delta(
+                delta, header, changed, removed,
+                timestamp() if created is None else created, props,
+            )
+        if not update:
+            props = None
+
+    stamp = timestamp() if created is None else created
+    writer = BackgroundWriter(path, compress)
+    try:
+        with STATS.timer("serialize"):
+            stream = ChunkStream(writer, stamp)
+            render_ics(events, stream, header, STAMPMARK, props)
+            stream.flush()
+        digest = stream.digest.hexdigest()
+    except BaseException:
+        writer.close(commit=False)
+        raise
+    return _commit(path, writer, digest, inputs, created, manifest, stamp)
+
+
+def _bycategory(categories):
+    """Get an output filter keeping the events of some categories."""
+    return lambda event: event.category in categories
+
+
+def write_calendars(outputs, header, getevents, created=None, manifest=None,
+                    compress=None):
+    """Write several calendar files from one pass over the events.
+
+    outputs is a list of (path, keep, inputs) where keep is None for every
+    event, a set of categories, or a function taking an event. Each event
+    is serialized and encoded once and the bytes go to every output that
+    keeps it. Outputs whose inputs are unchanged in manifest are skipped
+    and nothing is generated if all of them are. Returns the paths written.
+    """
+    sinks = []
+    for path, keep, inputs in outputs:
+        if manifest is not None and inputs is not None:
+            if isfresh(manifest, path, inputs, created):
+                continue
+        if keep is not None and not callable(keep):
+            keep = _bycategory(frozenset(keep))
+        sinks.append((path, keep, inputs))
+    if not sinks:
+        return []
+
+    stamp = timestamp() if created is None else created
+    mark = STAMPMARK.encode("utf-8")
+    stampbytes = stamp.encode("utf-8")
+    writers = []
+    try:
+        for path, keep, inputs in sinks:
+            writers.append(BackgroundWriter(path, compress))
+        streams = [SinkStream(_) for _ in writers]
+        with STATS.timer("serialize"):
+            marked = header.format(STAMPMARK).replace("\n", "\r\n").encode("utf-8")
+            for stream in streams:
+                stream.write(marked, marked.replace(mark, stampbytes))
+            count = 0
+            for event in getevents():
+                count += 1
+                marked = formatevent(event, STAMPMARK).encode("utf-8")
+                stamped = marked.replace(mark, stampbytes)
+                for (path, keep, inputs), stream in zip(sinks, streams):
+                    if keep is None or keep(event):
+                        stream.write(marked, stamped)
+            footer = FOOTER.replace("\n", "\r\n").encode("utf-8")
+            for stream in streams:
+                stream.write(footer, footer)
+                stream.flush()
+            STATS.count("events", count)
+    except BaseException:
+        for writer in writers:
+            writer.close(commit=False)
+        raise
+
+    return [
+        path for (path, keep, inputs), writer, stream in zip(sinks, writers, streams)
+        if _commit(path, writer, stream.digest.hexdigest(), inputs, created,
+                   manifest, stamp)
+    ]
+
+
+def catpath(path, category):
+    """Get the path of a per category output, e.g. elca-2024-lesser.ics."""
+    dirname, base = os.path.split(path)
+    name, dot, ext = base.partition(".")
+    return os.path.join(dirname, "{}-{}{}{}".format(name, category.lower(), dot, ext))
+
+
+def add_output_arguments(parser):
+    """Add the output options shared by the calendar scripts."""
+    parser.add_argument(
+        "--dtstamp",
+        metavar="Stamp",
+        help="Use a fixed CREATED/DTSTAMP (YYYYMMDDTHHMMSSZ) or 'source' "
+        "for the newest source file time",
+    )
+    parser.add_argument(
+        "--manifest",
+        metavar="File",
+        help="Record input and output hashes in File and only regenerate "
+        "outputs that changed",
+    )
+    parser.add_argument(
+        "--update",
+        action="store_true",
+        help="Compare with the existing output file by UID and bump SEQUENCE "
+        "and LAST-MODIFIED of changed events",
+    )
+    parser.add_argument(
+        "--delta",
+        metavar="File",
+        help="Also write only the changed events to File (METHOD:PUBLISH) "
+        "and removed events to File-cancel (METHOD:CANCEL)",
+    )
+    parser.add_argument(
+        "-z",
+        choices=sorted(COMPRESSORS),
+        dest="compress",
+        help="Compress the output (adds .gz or .zst to the file name)",
+    )
+    parser.add_argument(
+        "--split",
+        action="store_true",
+        help="Also write one file per category (e.g. elca-2024-lesser.ics) "
+        "from the same pass",
+    )
+    add_stats_arguments(parser)
+
+
+def add_stats_arguments(parser):
+    """Add the --stats and --profile options, see instrument()."""
+    parser.add_argument(
+        "--stats",
+        metavar="File",
+        help="Write per stage timers and counters as JSON to File ('-' for "
+        "stderr)",
+    )
+    parser.add_argument(
+        "--profile",
+        metavar="File",
+        help="Run under cProfile and write the .pstats data to File",
+    )
+
+
+def collect(func, *args):
+    """Call func(*args) with STATS enabled and return (result, report).
+
+    Used in pool workers, whose report the parent merges into its own
+    STATS with Stats.merge().
+    """
+    STATS.enable()
+    try:
+        return func(*args), STATS.report()
+    finally:
+        STATS.disable()
+
+
+def writestats(path, report):
+    """Write a stats report as JSON to path, or stderr for '-'."""
+    text = json.dumps(report, indent=1)
+    if path == "-":
+        print(text, file=sys.stderr)
+        return
+    with atomic_open(path) as ofile:
+        ofile.write(text + "\n")
+
+
+@contextlib.contextmanager
+def instrument(args):
+    """Honour --stats and --profile around a block.
+
+    Blocks nested in another one (each output() of a script writing
+    several files inside its main) are part of the outer one, so a
+    single report and profile cover the whole run.
+    """
+    global INSTRUMENTED
+    if INSTRUMENTED or not (args.stats or args.profile):
+        yield
+        return
+    INSTRUMENTED = True
+    if args.stats:
+        STATS.enable()
+    profiler = None
+    if args.profile:
+        import cProfile
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+    try:
+        yield
+    finally:
+        INSTRUMENTED = False
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(args.profile)
+        if args.stats:
+            STATS.disable()
+            writestats(args.stats, STATS.report())
+
+
+def output(path, header, getevents, args, inputs, sources, categories=()):
+    """Write a calendar file using the shared output options.
+
+    Honours --stats and --profile around the whole write, see
+    instrument(). categories lists the event categories written to files
+    of their own with --split.
+    """
+    with instrument(args):
+        if args.split and categories:
+            return _split(path, header, getevents, args, inputs, sources, categories)
+        return _output(path, header, getevents, args, inputs, sources)
+
+
+def _output(path, header, getevents, args, inputs, sources):
+    """Write a calendar file honouring the manifest and update options."""
+    created = resolve_stamp(args.dtstamp, sources)
+    if args.compress is not None:
+        path += COMPRESSORS[args.compress]
+    if args.manifest is None:
+        return write_calendar(
+            path, header, getevents, created=created, update=args.update,
+            delta=args.delta, compress=args.compress,
+        )
+    manifest = readmanifest(args.manifest)
+    written = write_calendar(
+        path, header, getevents, inputhash(inputs, sources), created, manifest,
+        args.update, args.delta, args.compress,
+    )
+    writemanifest(args.manifest, manifest)
+    return written
+
+
+def _split(path, header, getevents, args, inputs, sources, categories):
+    """Write a combined file and one file per category in a single pass."""
+    if args.update or args.delta is not None:
+        raise ValueError("--update and --delta cannot be used with --split!")
+    created = resolve_stamp(args.dtstamp, sources)
+    suffix = COMPRESSORS.get(args.compress, "")
+    outputs = [(path + suffix, None, inputs)] + [
+        (catpath(path, _) + suffix, {_}, dict(inputs, category=_))
+        for _ in sorted(categories)
+    ]
+    manifest = None
+    if args.manifest is not None:
+        manifest = readmanifest(args.manifest)
+        outputs = [(_[0], _[1], inputhash(_[2], sources)) for _ in outputs]
+    written = write_calendars(
+        outputs, header, getevents, created, manifest, args.compress
+    )
+    if manifest is not None:
+        writemanifest(args.manifest, manifest)
+    return written
@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Generate ical calendar for the Chinese and Hebrew lunisolar calendars.
+
+Chinese months start on the day (China Standard Time, UTC+8) of a new
+moon and are numbered from the month holding the winter solstice, which
+is always the 11th. When 13 months fall between two winter solstices, the
+first one without a principal term (a multiple of 30 degrees of solar
+longitude) is the leap month and repeats the previous number. The new
+moons, solstices and solar terms are those astro.py finds for the year
+(astro.syzygies and astro.solarterms are cached per year), so the astro
+feed and this one share one ephem pass.
+
+The Hebrew calendar is arithmetic: years start from the molad (mean
+conjunction) of Tishrei, postponed by the dehiyyot, and need no
+astronomy. Its days begin at sunset on the evening before the dates
+written here.
+"""
+import sys
+import argparse
+import datetime
+import functools
+import ephem
+import astro
+import i18n
+import icalutil
+
+# ---------------------------------------------------------------------------#
+
+HEADER = """BEGIN:VCALENDAR
+VERSION:2.0
+CALSCALE:GREGORIAN
+PRODID:-//Adyeths//python lunisolar ical generator//EN
+CREATED;VALUE=DATE:{}
+"""
+
+# China Standard Time, in days ahead of UTC
+CHINA_OFFSET = 8.0 / 24.0
+
+# zodiac animals from the year of the Rat (e.g. 2020)
+ANIMALS = (
+    "Rat", "Ox", "Tiger", "Rabbit", "Dragon", "Snake",
+    "Horse", "Goat", "Monkey", "Rooster", "Dog", "Pig",
+)
+
+# chinese festivals: (month, day, summary), leap months never have any
+CHINESE_FESTIVALS = (
+    (1, 1, "Chinese New Year, Year of the {animal}"),
+    (1, 15, "Lantern Festival"),
+    (5, 5, "Dragon Boat Festival"),
+    (7, 7, "Qixi Festival"),
+    (8, 15, "Mid-Autumn Festival"),
+    (9, 9, "Double Ninth Festival"),
+)
+
+# hebrew months counted from Nisan, Adar II (13) only in leap years
+HEBREW_MONTHS = (
+    "Nisan", "Iyyar", "Sivan", "Tammuz", "Av", "Elul", "Tishrei",
+    "Cheshvan", "Kislev", "Tevet", "Shevat", "Adar", "Adar II",
+)
+
+# hebrew festivals: (month, day, summary), month 12 is the Adar of Purim
+HEBREW_FESTIVALS = (
+    (7, 1, "Rosh Hashanah {year}"),
+    (7, 10, "Yom Kippur"),
+    (7, 15, "Sukkot"),
+    (7, 22, "Shemini Atzeret"),
+    (7, 23, "Simchat Torah"),
+    (9, 25, "Hanukkah"),
+    (11, 15, "Tu BiShvat"),
+    (12, 14, "Purim"),
+    (1, 15, "Passover"),
+    (3, 6, "Shavuot"),
+    (5, 9, "Tisha B'Av"),
+)
+
+# date ordinal (proleptic Gregorian) of 1 Tishrei of year 1
+HEBREW_EPOCH = -1373427
+
+# hebrew year starting in the autumn of Gregorian year 0
+HEBREW_OFFSET = 3761
+
+# ---------------------------------------------------------------------------#
+
+
+def chinadate(dte):
+    """Get the date in China of an ephem.Date."""
+    return ephem.Date(dte + CHINA_OFFSET).datetime().date()
+
+
+@functools.lru_cache(maxsize=8)
+def chinesemonths(year):
+    """Get the Chinese months of the winter solstice year ending in year.
+
+    Returns a tuple of (first day, number, leap) from the 11th month,
+    which holds the winter solstice of the previous year, up to the
+    month before the 11th month of year.
+    """
+    newmoons = sorted({
+        chinadate(dte)
+        for yr in (year - 1, year)
+        for dte, eighth in astro.syzygies(yr)[1] if eighth == 0
+    })
+    terms = [
+        chinadate(dte)
+        for yr in (year - 1, year)
+        for dte, degrees in astro.solarterms(yr) if degrees % 30 == 0
+    ]
+    solstices = [
+        chinadate(astro.syzygies(_)[0][3]) for _ in (year - 1, year)
+    ]
+    first, last = [
+        [_ for _ in newmoons if _ <= solstice][-1] for solstice in solstices
+    ]
+    starts = [_ for _ in newmoons if first <= _ <= last]
+    leap = len(starts) == 14
+    months = []
+    number = 10
+    for start, end in zip(starts, starts[1:]):
+        if leap and months and not any(start <= _ < end for _ in terms):
+            months.append((start, number, True))
+            leap = False
+            continue
+        number = number % 12 + 1
+        months.append((start, number, False))
+    return tuple(months)
+
+
+def chineseyear(year):
+    """Get (date, summary) for the Chinese months and festivals of a year."""
+    dates = []
+    for start, number, leap in chinesemonths(year) + chinesemonths(year + 1):
+        if start.year == year:
+            dates.append((
+                start,
+                i18n.text(
+                    {
+                        True: "Chinese Leap Month {num}",
+                        False: "Chinese Month {num}",
+                    }[leap],
+                    num=number,
+                ),
+            ))
+    for start, number, leap in chinesemonths(year):
+        for month, day, summary in CHINESE_FESTIVALS:
+            if month == number and not leap:
+                dates.append((
+                    start + datetime.timedelta(days=day - 1),
+                    i18n.text(summary, animal=ANIMALS[(year - 2020) % 12]),
+                ))
+    return dates
+
+
+def elapseddays(hyear):
+    """Get the days from the epoch to the molad of Tishrei of a year.
+
+    The molad is counted in parts (1/25920 day); a molad on a Sunday,
+    Wednesday or Friday postpones the new year by a day.
+    """
+    months = (235 * hyear - 234) // 19
+    days = 29 * months + (12084 + 13753 * months) // 25920
+    return {True: days + 1, False: days}[(3 * (days + 1)) % 7 < 3]
+
+
+@functools.lru_cache(maxsize=16)
+def hebrewnewyear(hyear):
+    """Get the date ordinal of 1 Tishrei of a hebrew year."""
+    ny0, ny1, ny2 = [elapseddays(_) for _ in (hyear - 1, hyear, hyear + 1)]
+    if ny2 - ny1 == 356:
+        correction = 2
+    elif ny1 - ny0 == 382:
+        correction = 1
+    else:
+        correction = 0
+    return HEBREW_EPOCH + ny1 + correction
+
+
+def hebrewleap(hyear):
+    """Determine whether a hebrew year has 13 months."""
+    return (7 * hyear + 1) % 19 < 7
+
+
+def hebrewmonthdays(hyear, month):
+    """Get the number of days in a month of a hebrew year."""
+    length = hebrewnewyear(hyear + 1) - hebrewnewyear(hyear)
+    if month in (2, 4, 6, 10, 13):
+        return 29
+    if month == 12 and not hebrewleap(hyear):
+        return 29
+    if month == 8 and length % 10 != 5:
+        return 29
+    if month == 9 and length % 10 == 3:
+        return 29
+    return 30
+
+
+def hebrewdate(hyear, month, day):
+    """Get the date ordinal of a day in a hebrew year."""
+    last = {True: 13, False: 12}[hebrewleap(hyear)]
+    if month < 7:
+        before = list(range(7, last + 1)) + list(range(1, month))
+    else:
+        before = list(range(7, month))
+    return (
+        hebrewnewyear(hyear) + day - 1
+        + sum(hebrewmonthdays(hyear, _) for _ in before)
+    )
+
+
+def hebrewyear(year):
+    """Get (date, summary) for the Hebrew months and festivals of a year."""
+    dates = []
+    for hyear in (year + HEBREW_OFFSET - 1, year + HEBREW_OFFSET):
+        leap = hebrewleap(hyear)
+        for month in range(1, {True: 14, False: 13}[leap]):
+            if month == 7:
+                continue
+            name = HEBREW_MONTHS[month - 1]
+            if month == 12 and leap:
+                name = "Adar I"
+            dates.append((
+                hebrewdate(hyear, month, 1),
+                i18n.text("Rosh Chodesh {month}", month=name),
+            ))
+        for month, day, summary in HEBREW_FESTIVALS:
+            if month == 12 and leap:
+                month = 13
+            dte = hebrewdate(hyear, month, day)
+            if summary == "Tisha B'Av" and dte % 7 == 6:
+                # postponed from Shabbat
+                dte += 1
+            dates.append((dte, i18n.text(summary, year=hyear)))
+    return [
+        (datetime.date.fromordinal(dte), summary) for dte, summary in dates
+        if datetime.date.fromordinal(dte).year == year
+    ]
+
+
+def outputcategories(chinese=True, hebrew=True):
+    """Get the set of event categories enabled by the generate options."""
+    return {
+        _ for _, enabled in (("chinese", chinese), ("hebrew", hebrew))
+        if enabled
+    }
+
+
+def generate(years, chinese=True, hebrew=True):
+    """Yield calendar events for one or more years.
+
+    chinese and hebrew select the calendars whose month starts and
+    festivals are written.
+    """
+    for year in icalutil.yearlist(years):
+        for category, enabled, func in (
+            ("chinese", chinese, chineseyear),
+            ("hebrew", hebrew, hebrewyear),
+        ):
+            if not enabled:
+                continue
+            with icalutil.STATS.timer("rules"):
+                dates = func(year)
+            seen = {}
+            icalutil.STATS.count("dates", 2 * len(dates))
+            for dte, summary in sorted(dates, key=lambda x: x[0]):
+                yield icalutil.Event(
+                    icalutil.stableuid(
+                        category, year, i18n.ident(summary), seen
+                    ),
+                    dte,
+                    dte + datetime.timedelta(days=1),
+                    summary,
+                    category,
+                )
+
+
+def sources():
+    """Get the files holding the rules for this calendar."""
+    return [__file__, astro.__file__, i18n.__file__, icalutil.__file__]
+
+
+def render_ics(events, stream, created=None):
+    """Write events to stream as a lunisolar icalendar file."""
+    icalutil.render_ics(events, stream, HEADER, created)
+
+
+def main():
+    """Parse our command line arguments and generate calendar."""
+    parser = argparse.ArgumentParser(
+        description="Create a Chinese and Hebrew calendar for a specified year."
+    )
+    parser.add_argument("-y", type=int, required=True, metavar="Year")
+    parser.add_argument("-s",
+                        help="Only write this calendar (repeatable)",
+                        action="append",
+                        choices=("chinese", "hebrew"),
+                        metavar="System")
+    i18n.add_locale_argument(parser)
+    icalutil.add_output_arguments(parser)
+    args = parser.parse_args()
+
+    systems = args.s or ["chinese", "hebrew"]
+    chinese, hebrew = "chinese" in systems, "hebrew" in systems
+
+    print("Generating lunisolar calendar for {}".format(args.y))
+
+    ###########################################################################
+
+    # ### Output ical file for dates.
+    try:
+        i18n.output(
+            "lunisolar-{}.ics".format(args.y),
+            HEADER,
+            lambda: generate(args.y, chinese, hebrew),
+            args,
+            {
+                "calendar": "lunisolar",
+                "years": [args.y],
+                "chinese": chinese,
+                "hebrew": hebrew,
+                "ephem": ephem.__version__,
+            },
+            sources(),
+            outputcategories(chinese, hebrew),
+        )
+    except ValueError as err:
+        sys.exit(str(err))
+
+# ---------------------------------------------------------------------------#
+
+
+if __name__ == "__main__":
+    main()
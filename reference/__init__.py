@@ -0,0 +1,4 @@
+"""Frozen copies of the original generators used as verification oracles.
+
+Do not edit these files; verify.py compares the current code against them.
+"""
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Load the rule and saint tables kept as CSV files in data/.
+
+A table named "usa-rules" is read from data/usa-rules.csv followed by any
+data/usa-rules.*.csv files (for example usa-rules.local.csv) in name
+order, then the same files in each directory listed in the
+ICALSCRIPTS_DATA environment variable. Local additions can therefore ship
+as extra files without editing the originals.
+
+Parsed tables are compiled into a marshal bundle next to the sources.
+The bundle records the size and modification time of every source file
+and is only reparsed when one of them changed (a content hash check
+avoids a rebuild when only the modification time moved).
+"""
+import csv
+import glob
+import hashlib
+import marshal
+import os
+
+# ---------------------------------------------------------------------------#
+
+BUNDLE_VERSION = 1
+
+DATADIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+BUNDLE = os.path.join(DATADIR, "rules.bundle")
+
+# ---------------------------------------------------------------------------#
+
+
+def datadirs():
+    """Get the directories searched for table files."""
+    extra = os.environ.get("ICALSCRIPTS_DATA", "")
+    return [DATADIR] + [_ for _ in extra.split(os.pathsep) if _]
+
+
+def sources(table):
+    """Get the files making up a table, in load order."""
+    files = []
+    for dirname in datadirs():
+        base = os.path.join(dirname, table + ".csv")
+        if os.path.exists(base):
+            files.append(base)
+        files.extend(sorted(glob.glob(os.path.join(dirname, table + ".*.csv"))))
+    return files
+
+
+def convert(value):
+    """Convert a CSV field: integers to int, empty fields to None."""
+    if value == "":
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        return value
+
+
+def parse(files):
+    """Read CSV files with header rows into one tuple of row tuples."""
+    rows = []
+    for fname in files:
+        with open(fname, newline="", encoding="utf-8") as ifile:
+            reader = csv.reader(ifile)
+            next(reader, None)
+            rows.extend(
+                tuple(convert(_) for _ in row) for row in reader if row
+            )
+    return tuple(rows)
+
+
+def stamp(fname):
+    """Get the cheap change check for a source file."""
+    info = os.stat(fname)
+    return (info.st_size, info.st_mtime_ns)
+
+
+def digest(fname):
+    """Get the content hash of a source file."""
+    with open(fname, "rb") as ifile:
+        return hashlib.sha256(ifile.read()).hexdigest()
+
+
+def readbundle():
+    """Read the compiled bundle, or return an empty one."""
+    try:
+        with open(BUNDLE, "rb") as ifile:
+            bundle = marshal.load(ifile)
+    except (OSError, EOFError, ValueError, TypeError):
+        return {"version": BUNDLE_VERSION, "tables": {}}
+    if not isinstance(bundle, dict) or bundle.get("version") != BUNDLE_VERSION:
+        return {"version": BUNDLE_VERSION, "tables": {}}
+    return bundle
+
+
+def writebundle(bundle):
+    """Write the compiled bundle, ignoring read only installs."""
+    tmpname = "{}.{}.tmp".format(BUNDLE, os.getpid())
+    try:
+        with open(tmpname, "wb") as ofile:
+            marshal.dump(bundle, ofile)
+        os.replace(tmpname, BUNDLE)
+    except OSError:
+        if os.path.exists(tmpname):
+            os.unlink(tmpname)
+
+
+def load(*tables):
+    """Load tables, returning a dict of table name to tuple of rows."""
+    bundle = readbundle()
+    changed = False
+    result = {}
+    for table in tables:
+        files = sources(table)
+        entry = bundle["tables"].get(table)
+        if entry is None or [_[0] for _ in entry["files"]] != files:
+            entry = None
+        elif any(stamp(_[0]) != tuple(_[1]) for _ in entry["files"]):
+            if any(digest(_[0]) != _[2] for _ in entry["files"]):
+                entry = None
+            else:
+                # only the modification times moved
+                entry["files"] = [(_[0], stamp(_[0]), _[2]) for _ in entry["files"]]
+                changed = True
+        if entry is None:
+            entry = {
+                "files": [(_, stamp(_), digest(_)) for _ in files],
+                "rows": parse(files),
+            }
+            bundle["tables"][table] = entry
+            changed = True
+        result[table] = entry["rows"]
+    if changed:
+        writebundle(bundle)
+    return result
@@ -4,7 +4,12 @@
 import sys
 import argparse
 import datetime
-from math import floor
+import functools
+from bisect import bisect_right
+import datetables
+import i18n
+import icalutil
+import ruledata
 
 # ---------------------------------------------------------------------------#
 
@@ -15,75 +20,47 @@ PRODID:-//Adyeths//python US Holiday ical generator//EN
 CREATED;VALUE=DATE:{}
 '''
 
-FOOTER = "END:VCALENDAR"
+# uid prefix, event length in days
+CATEGORIES = {
+    "weeks": ("usweeks", 7),
+    "federal": ("usfederal", 1),
+    "days": ("usdays", 1),
+}
 
-VEVENT = '''BEGIN:VEVENT
-UID:{}
-DTSTART;VALUE=DATE:{}
-DTEND;VALUE=DATE:{}
-SUMMARY:{}
-DTSTAMP:{}
-TRANSP:TRANSPARENT
-STATUS:CONFIRMED
-END:VEVENT'''
+# rows of (group, kind, month, day, weekday, offset, summary, start, end),
+# see README, and (region, action, kind, month, day, weekday, offset,
+# summary, target, start, end)
+TABLES = ruledata.load("usa-rules", "usa-regions")
+RULES = TABLES["usa-rules"]
 
 # ---------------------------------------------------------------------------#
 
 
+@functools.lru_cache(maxsize=None)
 def calceaster(year):
     """Get date as ordinal for easter in a given year using Meeus algorithm."""
-    vrh = ((19 * (year % 19)) + floor(year / 100) - int(
-        floor(year / 100) / 4) - (int((floor(year / 100) - int(
-            (floor(year / 100) + 8) / 25) + 1) / 3)) + 15) % 30
-    vrv = (32 + (2 * int(floor(year / 100) % 4)) + (2 * int(
-        (year % 100) / 4)) - vrh - ((year % 100) % 4)) % 7
-    vrm = int(((year % 19) + (11 * vrh) + (22 * vrv)) / 451)
+    return datetables.calceaster(year)
 
-    month = int((vrh + vrv + (7 * vrm) + 114) / 31)
-    day = ((vrh + vrv - (7 * vrm) + 114) % 31) + 1
-    return datetime.date(year, month, day).toordinal()
+
+# iso weekday numbers of the rule weekday names
+WEEKDAYS = {"mon": 1, "tue": 2, "wed": 3, "thu": 4, "fri": 5, "sat": 6, "sun": 7}
 
 
 def firstday(month, year, weekday):
     """Get first date for day of week in month."""
-    daykey = {
-        7: "sun",
-        1: "mon",
-        2: "tue",
-        3: "wed",
-        4: "thu",
-        5: "fri",
-        6: "sat"
-    }
-    for i in range(1, 8):
-        firstdt = datetime.date(year, month, i)
-        if daykey[firstdt.isoweekday()] == weekday:
-            break
-    return firstdt.toordinal()
+    ordinal, dow = datetables.monthstart(year, month)
+    return ordinal + (WEEKDAYS[weekday] - dow) % 7
 
 
 def lastday(month, year, weekday):
     """Get last date for day of week in month."""
-    daykey = {
-        7: "sun",
-        1: "mon",
-        2: "tue",
-        3: "wed",
-        4: "thu",
-        5: "fri",
-        6: "sat"
-    }
     nmonth, nyear = {
         True: (1, year + 1),
         False: (month + 1, year)
     }[month == 12]
 
-    endofmonth = datetime.date(nyear, nmonth, 1).toordinal() - 1
-    for i in range(0, 7):
-        lastdt = datetime.date.fromordinal(endofmonth - i)
-        if daykey[lastdt.isoweekday()] == weekday:
-            break
-    return lastdt.toordinal()
+    ordinal, dow = datetables.monthstart(nyear, nmonth)
+    return ordinal - 1 - (dow - 1 - WEEKDAYS[weekday]) % 7
 
 
 def getsunday(month, day, year, before=True):
@@ -102,156 +79,232 @@ def getsunday(month, day, year, before=True):
         }[dow == 7]
 
 
-def genholidays(args):
+def ruledate(rule, year, easter):
+    """Get the date as ordinal for a rule, or None if it is not kept.
+
+    rule is (kind, month, day, weekday, offset).
+    """
+    kind, month, day, weekday, offset = rule
+    if kind == "date":
+        return datetime.date(year, month, day).toordinal()
+    if kind == "observed":
+        tmp = firstday(month, year, weekday) + offset
+        if tmp == datetime.date(year, month, day).toordinal():
+            return None
+        return tmp
+    if kind == "first":
+        return firstday(month, year, weekday) + offset
+    if kind == "last":
+        return lastday(month, year, weekday) + offset
+    if kind == "sunday":
+        return getsunday(month, day, year)
+    if kind == "easter":
+        return easter + offset
+    if kind == "quadrennial":
+        if year % 4 != offset:
+            return None
+        return datetime.date(year, month, day).toordinal()
+    raise ValueError("Unknown rule kind: {}".format(kind))
+
+
+def period(rule, column=7):
+    """Get the (first, last) year a rule is in effect, None when open.
+
+    The years are read from column on, 7 for rules and 9 for region rows.
+    """
+    return (tuple(rule[column:column + 2]) + (None, None))[:2]
+
+
+def ruleindex(rules, column=7):
+    """Compile rules and their effective years into a bisect index.
+
+    Returns (bounds, active): bounds is the sorted list of years in which
+    the rules in effect change and active[i] holds, in table order, the
+    rules in effect from bounds[i - 1] up to the year before bounds[i].
+    """
+    periods = [period(_, column) for _ in rules]
+    bounds = sorted(
+        {first for first, _ in periods if first is not None}
+        | {last + 1 for _, last in periods if last is not None}
+    )
+    active = []
+    for year in [(bounds or [1])[0] - 1] + bounds:
+        active.append(tuple(
+            rule for rule, (first, last) in zip(rules, periods)
+            if (first is None or first <= year) and (last is None or year <= last)
+        ))
+    return bounds, active
+
+
+# years where the rules in effect change -> rules in effect, see ruleindex
+BOUNDS, ACTIVE = ruleindex(RULES)
+
+
+def activerules(year):
+    """Get the rules in effect in a year, in table order."""
+    return ACTIVE[bisect_right(BOUNDS, year)]
+
+
+def genholidays(year):
     """Generate holiday dictionaries."""
     # some variables that will hold our dates
-    easter = calceaster(args.y)
+    with icalutil.STATS.timer("easter"):
+        easter = calceaster(year)
     weeks = []
     dates = []
     dates2 = []
+    groups = {"weeks": weeks, "federal": dates, "days": dates2}
 
     ###########################################################################
 
-    # federal holidays
-    for i in [(1, 1, "✯ New Years Day ✯"),
-              (1, 15, "✯ Martin Luther King’s Birthday ✯"),
-              (2, 22, "✯ Washington’s Birthday ✯"),
-              (7, 4, "✯ Independence Day ✯"),
-              (10, 12, "✯ Columbus Day ✯"),
-              (11, 11, "✯ Veterans’ Day ✯"),
-              (12, 25, "✯ Christmas Day ✯")]:
-        dates.append((datetime.date(args.y, i[0], i[1]).toordinal(),
-                      i[2]))
-
-    for i in [(1, 15, "✯ Martin Luther King’s Birthday (Observed) ✯", 14),
-              (2, 22, "✯ Washington’s Birthday (Observed) ✯", 14),
-              (10, 12, "✯ Columbus Day (Observed) ✯", 7)]:
-        tmp = firstday(i[0], args.y, "mon") + i[3]
-        if tmp != datetime.date(args.y, i[0], i[1]).toordinal():
-            dates.append((tmp, i[2]))
-
-    dates.append((lastday(5, args.y, "mon"), "✯ Memorial Day ✯"))
-    dates.append((firstday(9, args.y, "mon"), "✯ Labor Day ✯"))
-    dates.append((firstday(11, args.y, "thu") + 21, "✯ Thanksgiving Day ✯"))
-    if args.y % 4 == 1:
-        dates.append((datetime.date(args.y, 1, 20).toordinal(),
-                      "✯ Inauguration day ✯"))
-
-    # national weeks recognized by presidential proclamation
-    for i in [(3, "sun", 0, "Save Your Vision Week"),
-              (3, "sun", 14, "National Poison Prevention Week"),
-              (5, "fri", 9, "National Transportation Week"),
-              (5, "sun", 14, "World Trade Week"),
-              (5, "sun", 14, "National Hurricane Preparedness Week"),
-              (7, "sun", 14, "Captive Nations Week"),
-              (9, "sun", 14, "National Farm Safety and Health Week"),
-              (10, "sun", 7, "National School Lunch Week"),
-              (10, "sun", 14, "National Character Counts Week"),
-              (10, "sun", 14, "National Forest Products Week"),
-              (11, "thu", 17, "National Family Week"),
-              (11, "thu", 17, "National Farm-City Week")]:
-        weeks.append((firstday(i[0], args.y, i[1]) + i[2], i[3]))
-    for i in [(4, 14, "Pan American Week"),
-              (6, 14, "National Flag Week"),
-              (9, 17, "Constitution Week"),
-              (10, 9, "Fire Prevention Week"),
-              (12, 10, "Human Rights Week")]:
-        weeks.append((getsunday(i[0], i[1], args.y), i[2]))
-    for i in [(4, "sat", 6, "National Volunteer Week"),
-              (5, "mon", 8, "National Safe Boating Week")]:
-        weeks.append((lastday(i[0], args.y, i[1]) - i[2], i[3]))
-    # additional weeks that some people celebrate
-    kwanzaa = datetime.date(args.y, 12, 26).toordinal()
-    weeks.append((kwanzaa, "Kwanzaa"))
-
-    # additional holidays recognized by presidential proclamation
-    for i in [(1, 16, "Religious Freedom Day"),
-              (2, 15, "Susan B. Anthony Day"),
-              (3, 10, "Harriet Tubman Day"),
-              (3, 25, "Greek Independence Day"),
-              (3, 31, "Cesar Chavez Day"),
-              (4, 6, "National Tartan Day"),
-              (4, 9, "National Former Prisoner of War Recognition Day"),
-              (4, 14, "Pan American Day"),
-              (5, 1, "Loyalty Day"),
-              (5, 1, "Law Day, U.S.A."),
-              (5, 15, "Peace Officers Memorial Day"),
-              (5, 19, "Malcolm X Day"),
-              (5, 22, "National Maritime Day"),
-              (5, 25, "National Missing Childrens Day"),
-              (6, 14, "Flag Day"),
-              (7, 27, "National Korean War Veterans Armistice Day"),
-              (8, 16, "National Airborne Day"),
-              (8, 26, "Women’s Equality Day"),
-              (9, 11, "Patriot Day"),
-              (9, 11, "Emergency Number Day"),
-              (9, 17, "Citizenship Day"),
-              (9, 22, "American Business Womens Day"),
-              (9, 28, "National Good Neighbor Day"),
-              (10, 6, "German-American Day"),
-              (10, 9, "Leif Erikson Day"),
-              (10, 11, "General Pulaski Memorial Day"),
-              (10, 15, "White Cane Safety Day"),
-              (10, 24, "United Nations Day"),
-              (11, 9, "World Freedom Day"),
-              (11, 15, "National Philanthropy Day"),
-              (11, 15, "America Recycles Day"),
-              (12, 1, "World AIDS Day"),
-              (12, 3, "International Day of Persons with Disabilities"),
-              (12, 7, "National Pearl Harbor Remembrance Day"),
-              (12, 10, "Human Rights Day"),
-              (12, 15, "Bill of Rights Day"),
-              (12, 17, "Wright Brothers Day")]:
-        dates2.append((datetime.date(args.y, i[0], i[1]).toordinal(), i[2]))
-    for i in [(1, "sun", 14, "National Sanctity of Human Life Day"),
-              (4, "thu", 7, "National D.A.R.E. Day"),
-              (5, "thu", 0, "National Day of Prayer"),
-              (5, "fri", 7, "Military Spouse Day"),
-              (5, "sun", 7, "Mother’s Day"),
-              (5, "fri", 14, "National Defense Transportation Day"),
-              (5, "sat", 14, "Armed Forces Day"),
-              (6, "mon", 0, "National Child’s Day"),
-              (6, "sun", 14, "Father’s Day"),
-              (9, "fri", 14, "National POW/MIA Recognition Day"),
-              (9, "mon", 21, "Family Day"),
-              (10, "mon", 0, "Child Health Day"),
-              (11, "mon", 1, "Election Day"),
-              (11, "thu", 22, "Native American Heritage Day")]:
-        dates2.append((firstday(i[0], args.y, i[1]) + i[2], i[3]))
-    for i in [(7, "sun", "Parent’s Day"),
-              (9, "sun", "Gold Star Mothers Day")]:
-        dates2.append((lastday(i[0], args.y, i[1]), i[2]))
-
-    # daylight savings time
-    for i in [(3, "sun", 7, "Daylight Savings Begins"),
-              (11, "sun", 0, "Daylight Savings Ends")]:
-        dates2.append((firstday(i[0], args.y, i[1]) + i[2], i[3]))
-
-    # additional unofficial observances
-    dates2.append((easter - 47, "Mardi Gras"))
-    for i in [(2, 2, "Groundhog Day"),
-              (2, 14, "Valentine’s Day"),
-              (3, 8, "International Women’s Day"),
-              (3, 14, "Pi Day"),
-              (3, 17, "St. Patrick’s Day"),
-              (4, 1, "April Fool’s Day"),
-              (4, 22, "Earth Day"),
-              (5, 1, "May Day"),
-              (5, 5, "Cinco de Mayo"),
-              (6, 19, "Juneteenth"),
-              (6, 27, "Hellen Keller Day"),
-              (9, 19, "International Talk Like a Pirate Day"),
-              (10, 31, "Halloween"),
-              (12, 24, "Christmas Eve"),
-              (12, 31, "New Years Eve")]:
-        dates2.append((datetime.date(args.y, i[0], i[1]).toordinal(), i[2]))
-    for i in [(4, "fri", "Arbor Day")]:
-        dates2.append((lastday(i[0], args.y, i[1]), i[2]))
+    # federal holidays, national weeks and additional days in effect in
+    # this year, in the order they are listed in data/usa-rules.csv
+    for rule in activerules(year):
+        dte = ruledate(rule[1:6], year, easter)
+        if dte is not None:
+            groups[rule[0]].append((dte, rule[6]))
 
     # return our dates
     return (weeks, dates, dates2)
 
 
+def getregions(rows):
+    """Split the usa-regions rows into region names and overlay indexes.
+
+    The add/remove/rename rows of each region are indexed by their
+    effective years like the rules, see ruleindex.
+    """
+    names = {}
+    overlays = {}
+    for row in rows:
+        if row[1] == "name":
+            names[row[0]] = row[7]
+        else:
+            overlays.setdefault(row[0], []).append(row)
+    return names, {
+        region: ruleindex(items, 9) for region, items in overlays.items()
+    }
+
+
+# region code -> name, region code -> (bounds, active) of its overlay rows
+REGIONS, OVERLAYS = getregions(TABLES["usa-regions"])
+
+
+def activeoverlay(region, year):
+    """Get the overlay rows of a region in effect in a year, in table order."""
+    if region not in OVERLAYS:
+        return ()
+    bounds, active = OVERLAYS[region]
+    return active[bisect_right(bounds, year)]
+
+
+def regionlist(region):
+    """Get the region codes selected by a region option.
+
+    region is None for none, True for every region, or a region code.
+    """
+    if region is None:
+        return []
+    if region is True:
+        return sorted(REGIONS)
+    if region.upper() not in REGIONS:
+        raise ValueError("Unknown region: {}".format(region))
+    return [region.upper()]
+
+
+def applyoverlay(dates, region, year, easter):
+    """Apply the add/remove/rename rows of a region to the federal dates.
+
+    remove drops every holiday whose name contains the target text and
+    rename replaces the target text, so observed days follow along. An
+    add row of kind holiday is dated offset days from the federal holiday
+    whose name contains the target text, and skipped in years without it.
+    """
+    result = list(dates)
+    for row in activeoverlay(region, year):
+        if row[1] == "add" and row[2] == "holiday":
+            found = [_[0] for _ in dates if row[8] in _[1]]
+            if found:
+                result.append((found[0] + row[6], row[7]))
+        elif row[1] == "add":
+            dte = ruledate(row[2:7], year, easter)
+            if dte is not None:
+                result.append((dte, row[7]))
+        elif row[1] == "remove":
+            result = [_ for _ in result if row[8] not in _[1]]
+        elif row[1] == "rename":
+            result = [(_[0], _[1].replace(row[8], row[7])) for _ in result]
+        else:
+            raise ValueError("Unknown region action: {}".format(row[1]))
+    return result
+
+
+def categories(weeks=False, days=False, region=None):
+    """Get the set of event categories enabled by the generate options.
+
+    The holidays of a region use its region code as category in place of
+    "federal"; region=True enables the federal set and every region.
+    """
+    codes = regionlist(region)
+    return {
+        _ for _, enabled in (
+            ("weeks", weeks),
+            ("federal", not codes or region is True),
+            ("days", days)
+        ) if enabled
+    } | set(codes)
+
+
+def generate(years, weeks=False, days=False, region=None):
+    """Yield calendar events for one or more years.
+
+    weeks and days select the presidential proclamation weeks and days
+    in addition to the federal holidays. region selects the holidays of a
+    state or territory (see regionlist) instead of the federal ones.
+    """
+    enabled = categories(weeks, days, region)
+    codes = regionlist(region)
+    for year in icalutil.yearlist(years):
+        if year <= 1582:
+            raise ValueError("Year must be greater than 1582!")
+        with icalutil.STATS.timer("rules"):
+            wks, dates, dates2 = genholidays(year)
+            easter = calceaster(year)
+            overlays = [
+                (_, applyoverlay(dates, _, year, easter)) for _ in codes
+            ]
+        for category, items in (
+            [("weeks", wks), ("federal", dates)] + overlays + [("days", dates2)]
+        ):
+            if category not in enabled:
+                continue
+            prefix, length = CATEGORIES.get(
+                category, ("us" + category.lower(), 1)
+            )
+            seen = {}
+            icalutil.STATS.count("dates", 2 * len(items))
+            for i in sorted(items, key=lambda x: x[0]):
+                yield icalutil.Event(
+                    icalutil.stableuid(prefix, year, i18n.ident(i[1]), seen),
+                    datetime.date.fromordinal(i[0]),
+                    datetime.date.fromordinal(i[0] + length),
+                    i[1],
+                    category,
+                )
+
+
+def sources():
+    """Get the files holding the rules for this calendar."""
+    return [
+        __file__, datetables.__file__, i18n.__file__, icalutil.__file__
+    ] + [_ for table in TABLES for _ in ruledata.sources(table)]
+
+
+def render_ics(events, stream, created=None):
+    """Write events to stream as a US Holiday icalendar file."""
+    icalutil.render_ics(events, stream, HEADER, created)
+
+
 def main():
     """Parse our command line arguments and generate calendar."""
     parser = argparse.ArgumentParser(
@@ -267,11 +320,29 @@ def main():
     parser.add_argument("-d",
                         help="Include presidential proclamation days",
                         action="store_true")
+    parser.add_argument("-r",
+                        help="Write the holidays of a state or territory "
+                             "(e.g. TX) instead of the federal ones; "
+                             "repeatable, 'all' writes every region",
+                        action="append",
+                        metavar="Region")
+    i18n.add_locale_argument(parser)
+    icalutil.add_output_arguments(parser)
     args = parser.parse_args()
 
     if args.y <= 1582:
         sys.exit("Year must be greater than 1582!")
 
+    codes = []
+    for region in args.r or []:
+        try:
+            codes += regionlist({True: True, False: region}[region == "all"])
+        except ValueError as err:
+            sys.exit(str(err))
+    codes = sorted(set(codes))
+    if len(codes) > 1 and args.delta is not None:
+        sys.exit("--delta can only be used with a single region!")
+
     print("Generating US Holiday calendar for {}".format(args.y))
 
     msg = {
@@ -288,66 +359,50 @@ def main():
 
     ###########################################################################
 
-    # ###################################### #
-    weeks, dates, dates2 = genholidays(args)
-
-    # ### Output ical file for dates and fdates.
-    with open("holidays-{}.ics".format(args.y), "w") as ofile:
-        uid = args.y * 1000
-        created = datetime.datetime.now().strftime("%Y%m%dT%H%M%SZ")
-
-        # ical header
-        ofile.write(HEADER.format(created).replace("\n", "\r\n"))
-
-        # output presidential proclamation weeks
-        uidnum = 0
-        if args.w is True:
-            for i in sorted(weeks, key=lambda x: x[0]):
-                uidnum += 1
-                uid = "usweeks{}{:02d}@adyeths".format(args.y, uidnum)
-                dtstart = datetime.date.fromordinal(i[0]).strftime("%Y%m%d")
-                dtend = datetime.date.fromordinal(i[0] + 7).strftime("%Y%m%d")
-                event = VEVENT.format(
-                    uid,
-                    dtstart,
-                    dtend,
-                    i[1],
-                    created)
-                print(event.replace("\n", "\r\n"), file=ofile, end="\r\n")
-
-        # output federal holidays
-        uidnum = 0
-        for i in sorted(dates, key=lambda x: x[0]):
-            uidnum += 1
-            uid = "usfederal{}{:02d}@adyeths".format(args.y, uidnum)
-            dtstart = datetime.date.fromordinal(i[0]).strftime("%Y%m%d")
-            dtend = datetime.date.fromordinal(i[0] + 1).strftime("%Y%m%d")
-            event = VEVENT.format(
-                uid,
-                dtstart,
-                dtend,
-                i[1],
-                created)
-            print(event.replace("\n", "\r\n"), file=ofile, end="\r\n")
-
-        # output federal proclamation days and other dates
-        uidnum = 0
-        if args.d:
-            for i in sorted(dates2, key=lambda x: x[0]):
-                uidnum += 1
-                uid = "usdays{}{:02d}@adyeths".format(args.y, uidnum)
-                dtstart = datetime.date.fromordinal(i[0]).strftime("%Y%m%d")
-                dtend = datetime.date.fromordinal(i[0] + 1).strftime("%Y%m%d")
-                event = VEVENT.format(
-                    uid,
-                    dtstart,
-                    dtend,
-                    i[1],
-                    created)
-                print(event.replace("\n", "\r\n"), file=ofile, end="\r\n")
-
-        # ical footer
-        ofile.write(FOOTER.replace("\n", "\r\n"))
+    # ### Output ical file for weeks, dates and dates2.
+    if not codes:
+        try:
+            i18n.output(
+                "holidays-{}.ics".format(args.y),
+                HEADER,
+                lambda: generate(args.y, args.w, args.d),
+                args,
+                {"calendar": "usa", "years": [args.y], "weeks": args.w,
+                 "days": args.d},
+                sources(),
+                categories(args.w, args.d),
+            )
+        except ValueError as err:
+            sys.exit(str(err))
+        return
+
+    # ### Output one file per region from a single generate pass.
+    region = {True: True, False: codes[0]}[len(codes) > 1]
+    events = []
+
+    def regionevents(code):
+        if not events:
+            events.extend(generate(args.y, args.w, args.d, region))
+        keep = categories(args.w, args.d, code)
+        return [_ for _ in events if _.category in keep]
+
+    # one stats report and profile for every region
+    with icalutil.instrument(args):
+        for code in codes:
+            print("Writing holidays for {}".format(REGIONS[code]))
+            try:
+                i18n.output(
+                    "holidays-{}-{}.ics".format(code.lower(), args.y),
+                    HEADER,
+                    functools.partial(regionevents, code),
+                    args,
+                    {"calendar": "usa", "years": [args.y], "weeks": args.w,
+                     "days": args.d, "region": code},
+                    sources(),
+                    categories(args.w, args.d, code),
+                )
+            except ValueError as err:
+                sys.exit(str(err))
 
 # ---------------------------------------------------------------------------#
 
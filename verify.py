@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Verify the generators against the frozen reference implementations.
+
+The modules in reference/ are unmodified copies of the original scripts.
+Every supported year is swept in parallel and checked for:
+
+    * identical calceaster/firstday/lastday/getsunday results
+    * identical event sets (start, end, summary); before the last change
+      of the effective years in data/usa-rules.csv only for the usa
+      rules in effect both then and now, and every usa event must come
+      from a rule in effect that year
+    * identical output bytes, ignoring CREATED/DTSTAMP and UID lines
+      (UIDs are no longer positional)
+    * astro event times within a tolerance
+
+The first divergent year and event is reported.
+"""
+import sys
+import argparse
+import datetime
+import io
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from types import SimpleNamespace
+
+import calendars
+
+# ---------------------------------------------------------------------------#
+
+# default year ranges for each calendar
+RANGES = {
+    "usa": (1583, 4099),
+    "elca": (1993, 4099),
+    "astro": (1900, 2100),
+}
+
+WEEKDAYS = ("sun", "mon", "tue", "wed", "thu", "fri", "sat")
+
+# output lines that are expected to differ
+IGNORED = (b"CREATED", b"DTSTAMP", b"UID")
+
+# ---------------------------------------------------------------------------#
+
+
+def reference(calendar):
+    """Import the frozen reference module for a calendar."""
+    return __import__("reference." + calendar, fromlist=[calendar])
+
+
+def normalize(data):
+    """Drop the output lines that are expected to differ."""
+    return b"\r\n".join(
+        _ for _ in data.split(b"\r\n") if not _.startswith(IGNORED)
+    )
+
+
+def refoutput(module, argv):
+    """Run a reference main() in a scratch directory and return its output."""
+    saved = sys.argv
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        sys.argv = ["reference"] + argv
+        os.chdir(tmpdir)
+        try:
+            with open(os.devnull, "w") as devnull:
+                stdout, stderr = sys.stdout, sys.stderr
+                sys.stdout = sys.stderr = devnull
+                try:
+                    module.main()
+                finally:
+                    sys.stdout, sys.stderr = stdout, stderr
+            (fname,) = os.listdir(tmpdir)
+            with open(fname, "rb") as ifile:
+                return ifile.read()
+        finally:
+            os.chdir(cwd)
+            sys.argv = saved
+
+
+def curoutput(calendar, year, options):
+    """Render the current implementation's output for a year."""
+    buf = io.StringIO()
+    calendars.render_ics(
+        calendars.generate(calendar, year, options), buf, calendar
+    )
+    return buf.getvalue().encode("utf-8")
+
+
+def diffevents(ref, cur):
+    """Get the first event only in ref or only in cur, or None."""
+    only = sorted(
+        [("reference", _) for _ in set(ref) - set(cur)]
+        + [("current", _) for _ in set(cur) - set(ref)],
+        key=lambda x: (x[1][0], x[0]),
+    )
+    return only[0] if only else None
+
+
+def check_helpers(calendar, year):
+    """Compare the date helper functions for a year."""
+    ref = reference(calendar)
+    cur = calendars.getmodule(calendar)
+    if ref.calceaster(year) != cur.calceaster(year):
+        return "calceaster({})".format(year)
+    for month in range(1, 13):
+        for weekday in WEEKDAYS:
+            if hasattr(ref, "firstday") and (
+                ref.firstday(month, year, weekday) != cur.firstday(month, year, weekday)
+            ):
+                return "firstday({}, {}, {!r})".format(month, year, weekday)
+            if hasattr(ref, "lastday") and (
+                ref.lastday(month, year, weekday) != cur.lastday(month, year, weekday)
+            ):
+                return "lastday({}, {}, {!r})".format(month, year, weekday)
+    dte = datetime.date(year, 1, 1)
+    while dte.year == year:
+        if ref.getsunday(dte.month, dte.day, year) != cur.getsunday(
+            dte.month, dte.day, year
+        ):
+            return "getsunday({}, {}, {})".format(dte.month, dte.day, year)
+        dte += datetime.timedelta(days=1)
+    return None
+
+
+def eventsfrom(calendar):
+    """Get the first year whose whole output is compared with the reference.
+
+    usa rules follow their effective years, so earlier years differ from
+    the reference by design and only part of their events is compared,
+    see usasummaries().
+    """
+    if calendar == "usa":
+        return calendars.getmodule("usa").BOUNDS[-1]
+    return RANGES[calendar][0]
+
+
+def usasummaries(year):
+    """Get (comparable, allowed) usa summaries for a year.
+
+    The reference has the current rules for every year. comparable holds
+    the summaries of the rules in effect both in year and now (and of no
+    other rule in effect in year), whose events must match the
+    reference. allowed holds the summaries of every rule whose effective
+    years include year, found by scanning the table rather than through
+    the bisect index of usa.py.
+    """
+    usa = calendars.getmodule("usa")
+    active = [
+        rule for rule in usa.RULES
+        if (usa.period(rule)[0] or year) <= year <= (usa.period(rule)[1] or year)
+    ]
+    current = set(usa.ACTIVE[-1])
+    others = {_[6] for _ in active if _ not in current}
+    comparable = {_[6] for _ in active if _ in current} - others
+    return comparable, {_[6] for _ in active}
+
+
+def check_usa(year, exact):
+    """Compare usa for a year."""
+    problem = check_helpers("usa", year)
+    if problem:
+        return problem
+    ref = reference("usa")
+    weeks, dates, dates2 = ref.genholidays(SimpleNamespace(y=year))
+    refevents = [(_[0], _[0] + 7, _[1]) for _ in weeks] + [
+        (_[0], _[0] + 1, _[1]) for _ in dates + dates2
+    ]
+    curevents = [
+        (_.start.toordinal(), _.end.toordinal(), _.summary)
+        for _ in calendars.generate("usa", year, {"weeks": True, "days": True})
+    ]
+    historic = year < eventsfrom("usa")
+    if historic:
+        comparable, allowed = usasummaries(year)
+        for event in curevents:
+            if event[2] not in allowed:
+                return "event of a rule not in effect: {}".format(event)
+        refevents = [_ for _ in refevents if _[2] in comparable]
+        curevents = [_ for _ in curevents if _[2] in comparable]
+    first = diffevents(refevents, curevents)
+    if first:
+        return "event only in {}: {}".format(*first)
+    if historic or not exact:
+        return None
+    if normalize(refoutput(ref, ["-y", str(year), "-w", "-d"])) != normalize(
+        curoutput("usa", year, {"weeks": True, "days": True})
+    ):
+        return "output bytes differ"
+    return None
+
+
+def check_elca(year, exact):
+    """Compare elca for a year."""
+    problem = check_helpers("elca", year)
+    if problem:
+        return problem
+    ref = reference("elca")
+    dates = ref.getdates(year)
+    refevents = [(_, _ + 1, dates[_]) for _ in dates] + [
+        (_[0], _[0] + 1, _[1]) for _ in ref.getfdates(year) + ref.getfdates2(year)
+    ]
+    curevents = [
+        (_.start.toordinal(), _.end.toordinal(), _.summary)
+        for _ in calendars.generate("elca", year)
+    ]
+    first = diffevents(refevents, curevents)
+    if first:
+        return "event only in {}: {}".format(*first)
+    if exact and normalize(refoutput(ref, ["-y", str(year)])) != normalize(
+        curoutput("elca", year, {})
+    ):
+        return "output bytes differ"
+    return None
+
+
+def check_astro(year, exact, tolerance):
+    """Compare astro for a year, allowing times to differ by tolerance."""
+    ref = reference("astro")
+    fmt = "%Y%m%dT%H%M%SZ"
+    refevents = sorted(
+        (datetime.datetime.strptime(_[0], fmt), _[2])
+        for _ in ref.gendates(SimpleNamespace(y=year))
+    )
+    curevents = sorted(
+        (_.start, _.summary) for _ in calendars.generate("astro", year)
+    )
+    refby = {}
+    curby = {}
+    for src, dst in ((refevents, refby), (curevents, curby)):
+        for when, summary in src:
+            dst.setdefault(summary, []).append(when)
+    for summary in sorted(set(refby) | set(curby)):
+        old = refby.get(summary, [])
+        new = curby.get(summary, [])
+        if len(old) != len(new):
+            return "{} count {} != {}".format(summary, len(old), len(new))
+        for ref_when, cur_when in zip(old, new):
+            if abs((ref_when - cur_when).total_seconds()) > tolerance:
+                return "{} at {} != {}".format(summary, ref_when, cur_when)
+    if exact and normalize(refoutput(ref, ["-y", str(year)])) != normalize(
+        curoutput("astro", year, {})
+    ):
+        return "output bytes differ"
+    return None
+
+
+def check(calendar, year, exact=True, tolerance=60.0):
+    """Verify one calendar and year, returning None or a description."""
+    if calendar == "usa":
+        return check_usa(year, exact)
+    if calendar == "elca":
+        return check_elca(year, exact)
+    return check_astro(year, exact, tolerance)
+
+
+def verify(calendar, first, last, exact=True, tolerance=60.0, workers=None):
+    """Sweep a year range in parallel; return (year, problem) or None."""
+    years = range(first, last + 1)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(
+            check,
+            [calendar] * len(years),
+            years,
+            [exact] * len(years),
+            [tolerance] * len(years),
+            chunksize=max(1, len(years) // 64),
+        )
+        for year, problem in zip(years, results):
+            if problem is not None:
+                return year, problem
+    return None
+
+
+def main():
+    """Parse our command line arguments and run the verification."""
+    parser = argparse.ArgumentParser(
+        description="Verify the generators against the reference implementations."
+    )
+    parser.add_argument("-c", action="append", choices=sorted(RANGES),
+                        metavar="Calendar",
+                        help="Calendar to verify (repeatable, default: all)")
+    parser.add_argument("--first", type=int, metavar="Year",
+                        help="First year (default depends on the calendar)")
+    parser.add_argument("--last", type=int, metavar="Year",
+                        help="Last year (default depends on the calendar)")
+    parser.add_argument("--tolerance", type=float, default=60.0, metavar="Seconds",
+                        help="Allowed astro time difference (default: 60)")
+    parser.add_argument("--no-bytes", action="store_true",
+                        help="Skip the exact output comparison")
+    parser.add_argument("-j", type=int, metavar="Workers", default=None)
+    args = parser.parse_args()
+
+    failed = False
+    for calendar in args.c or sorted(RANGES):
+        first = args.first if args.first is not None else RANGES[calendar][0]
+        last = args.last if args.last is not None else RANGES[calendar][1]
+        first = max(first, RANGES[calendar][0]) if calendar != "astro" else first
+        result = verify(
+            calendar, first, last, not args.no_bytes, args.tolerance, args.j
+        )
+        if result is None:
+            print("{}: {}-{} OK{}".format(
+                calendar, first, last,
+                {True: " (events from {})".format(eventsfrom(calendar)),
+                 False: ""}[first < eventsfrom(calendar) <= last],
+            ))
+        else:
+            failed = True
+            print("{}: first divergence in {}: {}".format(calendar, *result))
+    if failed:
+        sys.exit(1)
+
+
+# ---------------------------------------------------------------------------#
+
+
+if __name__ == "__main__":
+    main()